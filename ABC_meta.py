@@ -1,36 +1,127 @@
+from weakref import WeakSet, ref
+
+
 def abstractmethod(f):
     """Mark a method as abstract"""
     f.__is_abstractmethod__ = True
     return f
 
 
+def is_abstractmethod(value):
+    """Check if a value is a method marked as abstract"""
+    return callable(value) and getattr(value, "__is_abstractmethod__", False)
+
+
 def has_abstractmethods(cls):
-    """Check if a class has abstract methods"""
-    not_overridden = []
-    clsdict = cls.__dict__
-    for base in cls.__mro__[1:]:
-        for name, method in base.__dict__.items():
-            if (
-                name not in clsdict
-                and callable(method)
-                and hasattr(method, "__is_abstractmethod__")
-            ):
-                if method.__is_abstractmethod__:
-                    not_overridden.append(name)
-    return not_overridden
+    """Return the abstract methods of a class, declared in it or not overridden"""
+    abstract = [name for name, value in cls.__dict__.items() if is_abstractmethod(value)]
+    for base in cls.__bases__:
+        for name in getattr(base, "__abstractmethods__", ()):
+            if name not in abstract and is_abstractmethod(getattr(cls, name, None)):
+                abstract.append(name)
+    return abstract
+
+
+def _update_abstractmethods(cls):
+    """Recompute the abstract methods of a class and of its subclasses"""
+    type.__setattr__(cls, "__abstractmethods__", frozenset(has_abstractmethods(cls)))
+    for subclass in type.__subclasses__(cls):
+        if isinstance(subclass, ABCMeta):
+            _update_abstractmethods(subclass)
 
 
 class ABCMeta(type):
-    """ABCMeta is a metaclass that allows for the creation of abstract base classes (ABCs)"""
-
-    def __call__(cls, *args, **kwds):
-        print("call:", cls, args, kwds)
-        abstract = has_abstractmethods(cls)
-        if abstract:
-            raise TypeError(
-                ", ".join(abstract) + f" must be implemented in subclass {cls.__name__}"
+    """ABCMeta is a metaclass that allows for the creation of abstract base classes (ABCs)
+
+    The abstract methods of a class are computed once into __abstractmethods__, and
+    again only when the class or one of its bases is modified. A non-empty
+    __abstractmethods__ makes type refuse to instantiate the class, so instantiating
+    a concrete class costs no more than with type.
+
+    Classes can also be registered as virtual subclasses, or accepted by the
+    __subclasshook__ of the ABC. Real subclasses are recognized by type first, the
+    other results of subclass checks being cached in weak sets, the negative ones
+    until the registration of another virtual subclass. The sets are searched with
+    ref(), which returns the weak reference kept for the __subclasses__() of the
+    bases of a class instead of allocating one.
+    """
+
+    # Incremented on every registration to invalidate the negative caches
+    _abc_invalidation_counter = 0
+
+    def __new__(cls, name, bases, clsdict, **kwds):
+        new_cls = super().__new__(cls, name, bases, clsdict, **kwds)
+        for attr, value in (
+            ("__abstractmethods__", frozenset(has_abstractmethods(new_cls))),
+            ("_abc_registry", WeakSet()),
+            ("_abc_cache", WeakSet()),
+            ("_abc_negative_cache", WeakSet()),
+            ("_abc_negative_cache_version", ABCMeta._abc_invalidation_counter),
+        ):
+            type.__setattr__(new_cls, attr, value)
+        return new_cls
+
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        if name != "__abstractmethods__":
+            _update_abstractmethods(cls)
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        _update_abstractmethods(cls)
+
+    def register(cls, subclass):
+        """Register a class as a virtual subclass of the ABC and return it"""
+        if not isinstance(subclass, type):
+            raise TypeError("Can only register classes")
+        if issubclass(subclass, cls):
+            return subclass  # Already a subclass
+        if issubclass(cls, subclass):
+            raise RuntimeError("Refusing to create an inheritance cycle")
+        cls._abc_registry.add(subclass)
+        type.__setattr__(
+            ABCMeta, "_abc_invalidation_counter", ABCMeta._abc_invalidation_counter + 1
+        )
+        return subclass
+
+    def __instancecheck__(cls, instance):
+        if type.__instancecheck__(cls, instance):
+            return True
+        subclass = instance.__class__
+        if ref(subclass) in cls._abc_cache.data:
+            return True
+        subtype = type(instance)
+        if subtype is subclass:
+            if (
+                cls._abc_negative_cache_version == ABCMeta._abc_invalidation_counter
+                and ref(subclass) in cls._abc_negative_cache.data
+            ):
+                return False
+            return cls.__subclasscheck__(subclass)
+        return any(cls.__subclasscheck__(c) for c in (subclass, subtype))
+
+    def __subclasscheck__(cls, subclass):
+        # Raises the TypeError of issubclass() for anything but a class
+        if type.__subclasscheck__(cls, subclass):
+            return True
+        if ref(subclass) in cls._abc_cache.data:
+            return True
+        if cls._abc_negative_cache_version < ABCMeta._abc_invalidation_counter:
+            type.__setattr__(cls, "_abc_negative_cache", WeakSet())
+            type.__setattr__(
+                cls, "_abc_negative_cache_version", ABCMeta._abc_invalidation_counter
+            )
+        elif ref(subclass) in cls._abc_negative_cache.data:
+            return False
+
+        result = cls.__subclasshook__(subclass)
+        if result is NotImplemented:
+            result = (
+                any(issubclass(subclass, rcls) for rcls in cls._abc_registry)
+                or any(issubclass(subclass, scls) for scls in type.__subclasses__(cls))
             )
-        return super().__call__(*args, **kwds)
+        (cls._abc_cache if result else cls._abc_negative_cache).add(subclass)
+        return bool(result)
 
 
 class ABC(metaclass=ABCMeta):
@@ -65,5 +156,12 @@ class Instantiable_Class(ABC):
         pass
 
 
-# a = Uninstantiable_Class()
-b = Instantiable_Class("Bob")
+def main():
+    """Main function"""
+
+    # a = Uninstantiable_Class()
+    b = Instantiable_Class("Bob")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,35 @@
+import logging
+import marshal
+import mmap
 import os
+import re
+import struct
 import sys
-from types import ModuleType
-from xml.etree.ElementTree import parse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from importlib import import_module
+from importlib.abc import Loader, MetaPathFinder
+from importlib.util import MAGIC_NUMBER, LazyLoader, spec_from_file_location
+from io import BytesIO
+from itertools import islice
+from threading import RLock
+from xml.etree.ElementTree import iterparse, parse
 
+try:
+    from .helpers import Structure, StructArray
+except ImportError:  # Run as a script
+    from helpers import Structure, StructArray
 
-def _xml_to_code(filename):
+_log = logging.getLogger(__name__)
+
+# Code making the descriptors and the Structure base class available to the structures,
+# from the helpers module imported above whether run as a script or in the package
+_HEADER_CODE = f"from {Structure.__module__} import *\n"
+
+
+def _xml_to_code(filename, header=_HEADER_CODE):
     document = parse(filename)
-    code = "from helpers import *\n"
+    code = header
     for st in document.findall("structure"):
         code += _xml_struct_code(st)
     return code
@@ -25,51 +48,356 @@ def _xml_struct_code(st):
     return code
 
 
-class XMLImporter:
+def _xml_to_struct_codes(filename):
+    """Return the code of each structure of an xml file, by structure name
+
+    The document is read with iterparse and cleared after each structure, so the
+    whole tree never sits in memory.
+    """
+    codes = {}
+    context = iterparse(filename, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event == "end" and element.tag == "structure":
+            codes[element.get("name")] = _xml_struct_code(element)
+            root.clear()
+    return codes
+
+
+# Version of the code generated from xml files, to be incremented whenever the code
+# generation or the format of the cached results changes
+_CACHE_VERSION = 2
+
+
+def _cache_path(path, kind):
+    """Return the path of a compiled code cache of an xml file"""
+    head, tail = os.path.split(path)
+    return os.path.join(
+        head, "__pycache__", f"{tail}.{kind}.{sys.implementation.cache_tag}.pyc"
+    )
+
+
+def _cached(path, kind, build):
+    """Return build(path), cached next to the xml file like a .pyc file
+
+    The result must be marshallable. The cache is keyed by the bytecode magic number,
+    _CACHE_VERSION and the mtime and size of the xml file, so it is rebuilt whenever
+    the file or the code generation changes.
+    """
+    stat = os.stat(path)
+    header = MAGIC_NUMBER + struct.pack(
+        "<IQQ", _CACHE_VERSION, stat.st_mtime_ns, stat.st_size
+    )
+    cache_path = _cache_path(path, kind)
+    try:
+        with open(cache_path, "rb") as file:
+            data = file.read()
+        if data.startswith(header):
+            return marshal.loads(data[len(header) :])
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    result = build(path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # Write to a temporary file first so that no reader sees a partial cache
+        temp_path = f"{cache_path}.{os.getpid()}"
+        with open(temp_path, "wb") as file:
+            file.write(header + marshal.dumps(result))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+    return result
+
+
+def _xml_to_compiled_code(path):
+    """Return the compiled code of the structures of an xml file, without header"""
+    return _cached(
+        path, "module", lambda path: compile(_xml_to_code(path, ""), path, "exec")
+    )
+
+
+def _xml_to_compiled_struct_codes(path):
+    """Return the compiled code of each structure of an xml file, by structure name"""
+    return _cached(
+        path,
+        "structures",
+        lambda path: {
+            name: compile(code, path, "exec")
+            for name, code in _xml_to_struct_codes(path).items()
+        },
+    )
+
+
+def _install_struct_getattr(module, codes):
+    """Make a module execute the code of its structures on first access"""
+    pending = dict(codes)
+    all_names = list(codes)
+    # Held while executing a structure, so that threads accessing it first make it once
+    lock = RLock()
+
+    def __getattr__(name):
+        with lock:
+            if name in module.__dict__:
+                return module.__dict__[name]
+            code = pending.get(name)
+            if code is None:
+                raise AttributeError(
+                    f"module {module.__name__!r} has no attribute {name!r}"
+                )
+            exec(code, module.__dict__, module.__dict__)
+            pending.pop(name, None)
+            return module.__dict__[name]
+
+    def __dir__():
+        return sorted(set(module.__dict__) | set(all_names))
+
+    module.__getattr__ = __getattr__
+    module.__dir__ = __dir__
+    module.__all__ = all_names
+
+
+def _element_rows(source, tag, fields):
+    """Yield the field values of the elements with the given tag in an xml file
+
+    A field is read from the attribute of the same name, or else from the text of
+    the child element of the same name. Each element is removed from its parent
+    once read, so memory stays flat regardless of the file size.
+    """
+    parents = []
+    for event, element in iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag == tag:
+            attrib = element.attrib
+            yield tuple(
+                attrib[field] if field in attrib else element.findtext(field)
+                for field in fields
+            )
+            if parents:
+                parents[-1].remove(element)
+
+
+def load_records(source, structure, *, tag=None, batch_size=None, **kwargs):
+    """Lazily load instances of a structure from the records of an xml file
+
+    Records are the elements named tag, the structure name by default. Their values
+    are coerced and validated by structure.from_rows(), which also takes the keyword
+    arguments, with the record numbers as line numbers. Instances are yielded one by
+    one, or in lists of up to batch_size instances.
+    """
+    rows = _element_rows(source, tag or structure.__name__, list(structure._fields))
+    instances = structure.from_rows(rows, **kwargs)
+    if batch_size is None:
+        yield from instances
+        return
+    while batch := list(islice(instances, batch_size)):
+        yield batch
+
+
+def _records_end(data, tag):
+    """Return the offset after the last record of an xml file, before the closing
+    tags of its containers
+    """
+    end = len(data)
+    while (start := data.rfind(b"<", 0, end)) != -1:
+        closing = re.match(rb"</([^\s>]+)", data[start : start + 256])
+        if closing is None or closing[1] == tag:
+            # The end of the record, either self-closing or with a closing tag
+            return data.find(b">", start) + 1
+        end = start
+    return 0
+
+
+def _record_chunks(path, tag, chunk_size):
+    """Return the (start, end) offsets of chunks of records of an xml file
+
+    The chunks are at least chunk_size bytes long and begin at the start of a record.
+    """
+    start_tag = re.compile(b"<" + re.escape(tag.encode()) + rb"[\s/>]")
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = _records_end(data, tag.encode())
+            bounds = []
+            position = 0
+            while match := start_tag.search(data, position, end):
+                bounds.append(match.start())
+                position = match.start() + chunk_size
+    return list(zip(bounds, bounds[1:] + [end]))
+
+
+def _init_worker(path):
+    """Make the xml-defined structures importable in a worker process"""
+    sys.path[:] = path
+    if not any(isinstance(finder, XMLImporter) for finder in sys.meta_path):
+        install_import_hook()
+
+
+def _load_chunk(path, start, end, structure, tag, coerce):
+    """Load a chunk of records of an xml file into a StructArray
+
+    Return the array, the (record number, row, exception) of the bad records and
+    the number of records of the chunk.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    # The records of the chunk are wrapped in a single root to be well-formed
+    source = BytesIO(b"<records>" + data + b"</records>")
+    rows = _element_rows(source, tag, list(structure._fields))
+    errors = []
+    struct_array = StructArray.from_rows(
+        structure, rows, coerce=coerce, on_error=lambda *error: errors.append(error)
+    )
+    return struct_array, errors, len(struct_array) + len(errors)
+
+
+def load_records_parallel(
+    path,
+    structure,
+    *,
+    tag=None,
+    coerce=True,
+    on_error=None,
+    ordered=True,
+    chunk_size=1 << 24,
+    max_workers=None,
+):
+    """Load the records of an xml file in worker processes, yielding a StructArray
+    of the instances of each chunk of about chunk_size bytes
+
+    Chunks are split at record boundaries, so records must be siblings in the same
+    container element. Arrays pickle as a few columns instead of one dict per
+    instance. They are yielded in file order if ordered, or as they are done.
+    Workers import the structure by reference, through the xml import hook for
+    xml-defined structures. Bad records are reported to on_error(record number,
+    row, exc), or logged, once the records of the previous chunks are counted.
+    """
+    tag = tag or structure.__name__
+    chunks = _record_chunks(path, tag, chunk_size)
+    done = {}
+    reported = 0
+    record_count = 0
+
+    def report(index, errors, count):
+        nonlocal reported, record_count
+        done[index] = errors, count
+        while reported in done:
+            errors, count = done.pop(reported)
+            for number, row, exc in errors:
+                if on_error is None:
+                    _log.warning(
+                        "Skipping record %d of %s: %s", record_count + number, path, exc
+                    )
+                else:
+                    on_error(record_count + number, row, exc)
+            reported += 1
+            record_count += count
+
+    # Keep a bounded number of chunks in flight, so results don't pile up in memory
+    max_pending = 2 * (max_workers or os.cpu_count() or 1)
+    pending = deque() if ordered else set()
+    indexes = {}
+
+    def collect():
+        """Wait for the next finished chunks and yield their arrays"""
+        if ordered:
+            finished = [pending.popleft()]
+        else:
+            finished = wait(pending, return_when=FIRST_COMPLETED).done
+            pending.difference_update(finished)
+        for future in finished:
+            struct_array, errors, count = future.result()
+            report(indexes.pop(future), errors, count)
+            yield struct_array
+
+    with ProcessPoolExecutor(
+        max_workers, initializer=_init_worker, initargs=(sys.path,)
+    ) as executor:
+        for index, (start, end) in enumerate(chunks):
+            future = executor.submit(
+                _load_chunk, path, start, end, structure, tag, coerce
+            )
+            indexes[future] = index
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+            while len(pending) >= max_pending:
+                yield from collect()
+        while pending:
+            yield from collect()
+
+
+class XMLImporter(MetaPathFinder):
     """A custom finder class that can be used to load xml files"""
 
-    @staticmethod
-    def find_module(fullname, path=None):
-        """Find a module, given its full name and a path to search."""
+    def __init__(self, lazy=False, lazy_structures=False) -> None:
+        self.lazy = lazy
+        self.lazy_structures = lazy_structures
+
+    def find_spec(self, fullname, path=None, target=None):
+        """Find the spec of a module, given its full name and a path to search."""
         # fullname is the name of the to be imported module
-        # path is the path setting (for packages)
-        filepath = os.path.join(sys.path[0], fullname + ".xml")
-        if os.path.exists(filepath):
-            return XMLLoader(filepath)
+        # path is the __path__ of the parent package, None for top-level modules
+        name = fullname.rpartition(".")[2]
+        for entry in path or sys.path:
+            filepath = os.path.join(entry, name + ".xml")
+            if os.path.exists(filepath):
+                loader = XMLLoader(filepath, self.lazy_structures)
+                if self.lazy:
+                    # The module is only executed when one of its attributes is accessed
+                    loader = LazyLoader(loader)
+                return spec_from_file_location(fullname, filepath, loader=loader)
 
         return None
 
 
-class XMLLoader:
+class XMLLoader(Loader):
     """Custom loader class that can be used to load xml files"""
 
-    def __init__(self, path) -> None:
+    def __init__(self, path, lazy_structures=False) -> None:
         self._path = path
+        self._lazy_structures = lazy_structures
 
-    def load_module(self, fullname):
-        """Load a module, given its full name."""
-        if fullname in sys.modules:
-            return sys.modules[fullname]
-
-        module = ModuleType(fullname)
-        # Register the new module to the sys.modules cache
-        sys.modules[fullname] = module
-        module.__file__ = self._path
-        module.__loader__ = self
-        code = _xml_to_code(self._path)
+    def exec_module(self, module):
+        """Execute the structures of an xml file in a module created by the import"""
+        exec(_HEADER_CODE, module.__dict__, module.__dict__)
+        if self._lazy_structures:
+            _install_struct_getattr(module, _xml_to_compiled_struct_codes(self._path))
+            return
+        code = _xml_to_compiled_code(self._path)
         exec(code, module.__dict__, module.__dict__)
-        return module
 
 
-def install_import_hook():
-    """Install a custom import hook to load xml files"""
-    sys.meta_path.append(XMLImporter)
+def install_import_hook(lazy=False, lazy_structures=False):
+    """Install a custom import hook to load xml files
+
+    With lazy, a module is executed on first attribute access. With lazy_structures,
+    each structure of a module is only generated when it is first accessed.
+    """
+    sys.meta_path.append(XMLImporter(lazy, lazy_structures))
+
+
+def main():
+    """Main function"""
+
+    install_import_hook()
 
+    # datastruct.xml is found next to this module, whether run as a script or with -m
+    datastruct = import_module(f"{__package__}.datastruct" if __package__ else "datastruct")
 
-install_import_hook()
+    stock = datastruct.Stock("GOOG", "Google", price=2800, shares=100)
+    print(stock.ticker, stock.name, stock.price, stock.shares)
+    portfolio = os.path.join(os.path.dirname(__file__), "portfolio.xml")
+    for stock in load_records(portfolio, datastruct.Stock):
+        print(stock.ticker, stock.name, stock.price, stock.shares)
+    # stock.name = "Google Inc."
 
-import datastruct
 
-stock = datastruct.Stock("GOOG", "Google", price=2800, shares=100)
-print(stock.ticker, stock.name, stock.price, stock.shares)
-# stock.name = "Google Inc."
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from importlib import import_module
+
+# The public names of the package by submodule, imported on first access
+_EXPORTS = {
+    "structure.code_generation": (
+        "Descriptor",
+        "Typed",
+        "NumberChecked",
+        "Integer",
+        "Float",
+        "String",
+        "Positive",
+        "Sized",
+        "Regex",
+        "PositiveNumber",
+        "SizedString",
+        "SizedRegexString",
+        "Structure",
+        "StructArray",
+    ),
+    "function_overload": ("overload", "OverloadBase", "OverloadMeta"),
+    "debug.debugging_decorator_function": (
+        "debug",
+        "debugmethods",
+        "debugattr",
+        "DebugMeta",
+        "enable",
+        "disable",
+        "start_tracing",
+        "stop_tracing",
+        "dump_trace",
+        "start_queue_logging",
+        "stop_queue_logging",
+    ),
+    "debug.profiling": ("profile", "profilemethods", "ProfileMeta"),
+    "ABC_meta": ("ABCMeta", "abstractmethod"),
+    "dataclass_meta": ("Dataclass", "DataclassMeta"),
+    "XML_parser.XML_parser": (
+        "install_import_hook",
+        "load_records",
+        "load_records_parallel",
+    ),
+}
+_ORIGINS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_ORIGINS)
+
+
+def __getattr__(name):
+    """Import the submodule defining a public name on first access"""
+    try:
+        module = _ORIGINS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | _ORIGINS.keys())
@@ -0,0 +1,2 @@
+from .runner import BENCHMARKS, benchmark, compare, load, memory_benchmark, run, save
+from . import cases
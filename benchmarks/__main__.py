@@ -0,0 +1,42 @@
+import argparse
+import sys
+
+from .runner import compare, format_comparison, format_result, load, run, save
+
+
+def main(argv=None):
+    """Run the benchmarks, save their results and compare them to a baseline"""
+    parser = argparse.ArgumentParser(
+        prog="python -m <package>.benchmarks", description="Benchmark the structures of the repo"
+    )
+    parser.add_argument("-k", "--pattern", default="", help="run names containing it")
+    parser.add_argument("--warmup", type=int, default=1, help="runs before timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs")
+    parser.add_argument("--save", metavar="PATH", help="save the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON results to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative median increase reported as regression (default 0.1)",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.pattern,
+        warmup=args.warmup,
+        repeat=args.repeat,
+        report=lambda name, result: print(format_result(name, result), flush=True),
+    )
+    if args.save:
+        save(results, args.save)
+    if not args.baseline:
+        return 0
+    comparison = compare(results, load(args.baseline), args.threshold)
+    print()
+    print("\n".join(format_comparison(comparison)))
+    return int(any(regressed for *_, regressed in comparison))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
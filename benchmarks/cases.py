@@ -0,0 +1,197 @@
+import importlib
+from functools import lru_cache
+
+from .runner import benchmark, memory_benchmark
+
+# The repository package, benchmarks being one of its subpackages
+_PACKAGE = __package__.rpartition(".")[0]
+
+
+def _import(name):
+    """Import a module of the repository package by its name in the package"""
+    if not _PACKAGE:
+        raise ImportError(
+            "The benchmarks must be run in the repository package: "
+            "python -m <package>.benchmarks from its parent directory"
+        )
+    return importlib.import_module(f"{_PACKAGE}.{name}")
+
+
+@lru_cache(maxsize=None)
+def _helpers_stock():
+    """Return a Stock structure made of the descriptors of XML_parser/helpers"""
+    helpers = _import("XML_parser.helpers")
+
+    class Stock(helpers.Structure):
+        ticker = helpers.SizedRegexString(pattern="[A-Z]+$", maxlen=10)
+        name = helpers.SizedString(maxlen=10)
+        shares = helpers.PositiveNumber()
+        price = helpers.PositiveNumber()
+
+    return Stock
+
+
+# The Structure flavours benchmarked: name -> function returning the class, the
+# arguments of an instance, and an attribute to set and get with its new value
+STRUCTURES = {
+    "metaclass_structure.Crypto": lambda: (
+        _import("structure.metaclass_structure").Crypto,
+        ("BTC", 60000.0, 2),
+        "price",
+        61000.0,
+    ),
+    "decorator_structure.Stock": lambda: (
+        _import("structure.decorator_structure").Stock, ("F", 100, 18.0), "price", 19.0
+    ),
+    "length_checked_attributes.Stock": lambda: (
+        _import("structure.length_checked_attributes").Stock,
+        ("MSFT", "Microsoft", 300, 10),
+        "price",
+        20,
+    ),
+    "typed_checked_attributes.Good": lambda: (
+        _import("structure.typed_checked_attributes").Good,
+        ("Banana", 10, 4),
+        "price",
+        20,
+    ),
+    "code_generation.Stock": lambda: (
+        _import("structure.code_generation").Stock,
+        ("MSFT", "Microsoft", 300, 10),
+        "price",
+        20,
+    ),
+    "code_generation.FusedStock": lambda: (
+        _import("structure.code_generation").FusedStock,
+        ("MSFT", "Microsoft", 300, 10),
+        "price",
+        20,
+    ),
+    "code_generation.SlottedStock": lambda: (
+        _import("structure.code_generation").SlottedStock,
+        ("MSFT", "Microsoft", 300, 10),
+        "price",
+        20,
+    ),
+    "helpers.Stock": lambda: (
+        _helpers_stock(), ("MSFT", "Microsoft", 300, 10), "price", 20
+    ),
+    "dataclass_meta.Point": lambda: (_import("dataclass_meta").Point, (1, 2), "x", 3),
+    "plain.Stock2": lambda: (
+        _import("structure.code_generation").Stock2,
+        ("MSFT", "Microsoft", 300, 10),
+        "price",
+        20,
+    ),
+}
+
+
+def _register_structure(flavour, load):
+    """Register the construction, attribute and memory benchmarks of a flavour"""
+
+    @benchmark(f"{flavour}.init")
+    def init():
+        cls, args, _, _ = load()
+        return f"cls({', '.join(map(repr, args))})", {"cls": cls}
+
+    @benchmark(f"{flavour}.set")
+    def set_attribute():
+        cls, args, attribute, value = load()
+        return f"obj.{attribute} = {value!r}", {"obj": cls(*args)}
+
+    @benchmark(f"{flavour}.get")
+    def get_attribute():
+        cls, args, attribute, _ = load()
+        return f"obj.{attribute}", {"obj": cls(*args)}
+
+    @memory_benchmark(f"{flavour}.memory")
+    def memory():
+        cls, args, _, _ = load()
+        return lambda: cls(*args)
+
+
+for _flavour, _load in STRUCTURES.items():
+    _register_structure(_flavour, _load)
+
+
+@benchmark("code_generation.Quote.init")
+def frozen_init():
+    return "cls('MSFT', 300)", {"cls": _import("structure.code_generation").Quote}
+
+
+@benchmark("code_generation.Quote.hash")
+def frozen_hash():
+    return "hash(obj)", {"obj": _import("structure.code_generation").Quote("MSFT", 300)}
+
+
+@benchmark("code_generation.Venue.init")
+def interned_init():
+    venue = _import("structure.code_generation").Venue("XNAS", "Nasdaq")
+    return "cls('XNAS', 'Nasdaq')", {"cls": type(venue), "venue": venue}
+
+
+class Plain:
+    """A method call to compare the overload dispatch to"""
+
+    def f(self, x: str, y: str):
+        pass
+
+
+@lru_cache(maxsize=None)
+def _overloaded():
+    """Return a class with a method overloaded on the type of its second argument"""
+    function_overload = _import("function_overload")
+
+    class Overloaded(function_overload.OverloadBase):
+        @function_overload.overload
+        def f(self, x: str, y: int):
+            pass
+
+        @function_overload.overload
+        def f(self, x: str, y: str):
+            pass
+
+    return Overloaded
+
+
+@benchmark("function_overload.plain_method")
+def plain_method():
+    return "obj.f('a', 'b')", {"obj": Plain()}
+
+
+@benchmark("function_overload.dispatch")
+def overload_dispatch():
+    return "obj.f('a', 'b')", {"obj": _overloaded()()}
+
+
+@benchmark("function_overload.dispatch_keywords")
+def overload_dispatch_keywords():
+    return "obj.f('a', y='b')", {"obj": _overloaded()()}
+
+
+@benchmark("ABC_meta.instantiate")
+def abc_instantiate():
+    return "cls('Bob')", {"cls": _import("ABC_meta").Instantiable_Class}
+
+
+@benchmark("ABC_meta.isinstance")
+def abc_isinstance():
+    abc_meta = _import("ABC_meta")
+    return "isinstance(obj, cls)", {
+        "obj": abc_meta.Instantiable_Class("Bob"),
+        "cls": abc_meta.ABC,
+    }
+
+
+@benchmark("ABC_meta.isinstance_registered")
+def abc_isinstance_registered():
+    abc_meta = _import("ABC_meta")
+
+    class Virtual(metaclass=abc_meta.ABCMeta):
+        pass
+
+    class Registered:
+        pass
+
+    Virtual.register(Registered)
+    return "isinstance(obj, cls)", {"obj": Registered(), "cls": Virtual}
@@ -0,0 +1,57 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+
+def import_times(modules, cwd=_ROOT.parent):
+    """Return the cumulative times of importing modules in turn in a new interpreter,
+    in us, each module counting only the imports not already done by the previous ones
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        *_, cumulative, name = line.split("|")
+        if name.strip() in modules:
+            times[name.strip()] = int(cumulative)
+    missing = set(modules) - times.keys()
+    if missing:
+        raise ValueError(f"No import time reported for {', '.join(sorted(missing))}")
+    return times
+
+
+def import_time(module, cwd=_ROOT.parent):
+    """Return the cumulative time of importing a module in a new interpreter, in us"""
+    return import_times([module], cwd)[module]
+
+
+def main(argv=None):
+    """Check that importing the package stays under a time budget"""
+    parser = argparse.ArgumentParser(
+        prog="python -m <package>.benchmarks.importtime",
+        description="Check the import time of the package with python -X importtime",
+    )
+    parser.add_argument("module", nargs="?", default=_ROOT.name, help="module to import")
+    parser.add_argument(
+        "--budget", type=float, default=50.0, help="median import time allowed in ms"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="imports measured")
+    args = parser.parse_args(argv)
+
+    times = [import_time(args.module) / 1000 for _ in range(args.repeat)]
+    median = statistics.median(times)
+    print(f"import {args.module}: {median:.1f} ms (budget {args.budget:.1f} ms)")
+    return int(median > args.budget)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
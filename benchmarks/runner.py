@@ -0,0 +1,149 @@
+import gc
+import json
+import platform
+import statistics
+import timeit
+import tracemalloc
+
+# The registered benchmarks: name -> (unit, factory)
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a timing benchmark
+
+    The decorated factory returns the statement to time and its namespace.
+    """
+
+    def decorate(factory):
+        BENCHMARKS[name] = ("ns", factory)
+        return factory
+
+    return decorate
+
+
+def memory_benchmark(name):
+    """
+    Register a memory benchmark
+
+    The decorated factory returns a function making one of the objects to measure.
+    """
+
+    def decorate(factory):
+        BENCHMARKS[name] = ("bytes", factory)
+        return factory
+
+    return decorate
+
+
+def time_runs(stmt, namespace, warmup=1, repeat=5):
+    """Return the time per execution of a statement in ns, for each run"""
+    timer = timeit.Timer(stmt, globals=namespace)
+    number, _ = timer.autorange()
+    for _ in range(warmup):
+        timer.timeit(number)
+    return [timer.timeit(number) / number * 1e9 for _ in range(repeat)]
+
+
+def memory_runs(make, warmup=1, repeat=5, count=10_000):
+    """Return the memory allocated per object made in bytes, for each run"""
+    for _ in range(warmup):
+        make()
+    runs = []
+    for _ in range(repeat):
+        objects = [None] * count
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            objects[i] = make()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        runs.append((after - before) / count)
+        del objects
+    return runs
+
+
+def summarize(unit, runs):
+    """Return the median, spread and runs of a benchmark"""
+    return {
+        "unit": unit,
+        "median": statistics.median(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "min": min(runs),
+        "max": max(runs),
+        "runs": runs,
+    }
+
+
+def run(pattern="", warmup=1, repeat=5, report=None):
+    """
+    Run the benchmarks whose name contains pattern and return their results
+
+    report: called with the name and summary of each benchmark once run
+    """
+    results = {}
+    for name, (unit, factory) in BENCHMARKS.items():
+        if pattern not in name:
+            continue
+        if unit == "ns":
+            runs = time_runs(*factory(), warmup=warmup, repeat=repeat)
+        else:
+            runs = memory_runs(factory(), warmup=warmup, repeat=repeat)
+        results[name] = summarize(unit, runs)
+        if report is not None:
+            report(name, results[name])
+    return results
+
+
+def save(results, path):
+    """Save results to a JSON file with the Python version they were measured with"""
+    document = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def load(path):
+    """Load the results saved to a JSON file"""
+    with open(path) as file:
+        return json.load(file)["results"]
+
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Compare results to a baseline
+
+    Return (name, baseline median, median, ratio, regressed) for the benchmarks in
+    both, regressed when the median exceeds the baseline one by more than threshold.
+    """
+    comparison = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["median"]
+        ratio = result["median"] / base if base else float("inf")
+        comparison.append((name, base, result["median"], ratio, ratio > 1 + threshold))
+    return comparison
+
+
+def format_result(name, result):
+    """Return a line reporting the result of a benchmark"""
+    return (
+        f"{name:<48} {result['median']:>12.1f} {result['unit']:<5} "
+        f"± {result['stdev']:>9.1f} [{result['min']:.1f}, {result['max']:.1f}]"
+    )
+
+
+def format_comparison(comparison):
+    """Return the lines reporting a comparison to a baseline"""
+    lines = [f"{'benchmark':<48} {'baseline':>12} {'current':>12} {'ratio':>8}"]
+    for name, base, median, ratio, regressed in comparison:
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"{name:<48} {base:>12.1f} {median:>12.1f} {ratio:>8.2f}{flag}")
+    return lines
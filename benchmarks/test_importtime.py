@@ -0,0 +1,33 @@
+import pytest
+
+from .. import _EXPORTS
+from .importtime import _ROOT, import_time, import_times
+
+# Cumulative import times allowed in ms, as reported by python -X importtime,
+# the best of REPEAT imports in new interpreters
+PACKAGE_BUDGET = 50
+SUBMODULE_BUDGET = 150
+ALL_BUDGET = 300
+REPEAT = 3
+
+_SUBMODULES = [f"{_ROOT.name}.{module}" for module in _EXPORTS]
+
+
+def best_time(module):
+    """Return the shortest cumulative time of importing a module, in ms"""
+    return min(import_time(module) for _ in range(REPEAT)) / 1000
+
+
+def test_package_import_time():
+    assert best_time(_ROOT.name) < PACKAGE_BUDGET
+
+
+@pytest.mark.parametrize("module", _SUBMODULES)
+def test_submodule_import_time(module):
+    assert best_time(module) < SUBMODULE_BUDGET
+
+
+def test_all_submodules_import_time():
+    modules = [_ROOT.name, *_SUBMODULES]
+    total = min(sum(import_times(modules).values()) for _ in range(REPEAT)) / 1000
+    assert total < ALL_BUDGET
@@ -29,5 +29,12 @@ class Point(Dataclass):
     y: int
 
 
-point = Point(x=1, y=2)
-# print(point.x, point.y)
+def main():
+    """Main function"""
+
+    point = Point(x=1, y=2)
+    # print(point.x, point.y)
+
+
+if __name__ == "__main__":
+    main()
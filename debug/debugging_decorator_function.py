@@ -1,52 +1,474 @@
-# import logging
-# import os
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import deque
 from functools import partial, wraps
+from inspect import isasyncgenfunction, iscoroutinefunction, isgeneratorfunction
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Event, Lock, Thread, get_ident
+from time import perf_counter, perf_counter_ns
+from weakref import WeakSet
+
+# Whether newly instrumented functions and classes start with debugging enabled
+_enabled = "DEBUG" in os.environ
+
+# The functions and classes instrumented, switched by enable() and disable()
+_functions = WeakSet()
+_classes = WeakSet()
+
+
+class _Arguments:
+    """Arguments of a call, formatted only if logged"""
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        args_str = ", ".join(map(repr, self.args))
+        kwargs_str = ", ".join(f"{k}={v!r}" for k, v in self.kwargs.items())
+        return ", ".join(filter(None, (args_str, kwargs_str)))
+
+
+class _TraceBuffer:
+    """A preallocated ring buffer of trace events
+
+    Events are (phase, name, thread id, time in ns) tuples, with the id of the span
+    for the asynchronous ones, formatted only when exported.
+    """
+
+    def __init__(self, size):
+        size = 1 << max(size - 1, 1).bit_length()  # A power of 2 to mask indexes
+        self.events = [None] * size
+        self.mask = size - 1
+        self.ticks = count()
+
+    def ordered_events(self):
+        """Return the events of the buffer from the oldest one"""
+        cursor = next(self.ticks) & self.mask
+        return [e for e in self.events[cursor:] + self.events[:cursor] if e is not None]
+
+
+# The buffer recording the calls while tracing, and the last one after it stops
+_trace = None
+_last_trace = None
+
+
+def _wrap(func, prefix, suffix):
+    """Return a wrapper logging the calls of a function while its enabled is set
+
+    The execution of coroutines, generators and asynchronous generators is logged
+    when it starts and when it ends with its duration, not their creation. While
+    tracing, calls of functions are recorded as begin and end events and those of
+    coroutines as asynchronous spans.
+    """
+    log = logging.getLogger(func.__module__)
+    msg = prefix + func.__qualname__
+    name = sys.intern(func.__qualname__)
+
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not wrapper.enabled:
+                return await func(*args, **kwargs)
+            trace = _trace
+            if trace is not None:
+                span = next(trace.ticks)
+                trace.events[span & trace.mask] = (
+                    "b", name, get_ident(), perf_counter_ns(), span
+                )
+            if not log.isEnabledFor(logging.DEBUG):
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    if trace is not None:
+                        trace.events[next(trace.ticks) & trace.mask] = (
+                            "e", name, get_ident(), perf_counter_ns(), span
+                        )
+            log.debug("%s(%s)%s", msg, _Arguments(args, kwargs), suffix)
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                log.debug("%s done in %.6fs%s", msg, perf_counter() - start, suffix)
+                if trace is not None:
+                    trace.events[next(trace.ticks) & trace.mask] = (
+                        "e", name, get_ident(), perf_counter_ns(), span
+                    )
+
+    elif isasyncgenfunction(func):
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            logged = wrapper.enabled and log.isEnabledFor(logging.DEBUG)
+            if logged:
+                log.debug("%s(%s)%s", msg, _Arguments(args, kwargs), suffix)
+                start = perf_counter()
+            agen = func(*args, **kwargs)
+            try:
+                value = await agen.__anext__()
+                while True:
+                    try:
+                        sent = yield value
+                    except GeneratorExit:
+                        await agen.aclose()
+                        raise
+                    except BaseException as exc:
+                        value = await agen.athrow(exc)
+                    else:
+                        value = await agen.asend(sent)
+            except StopAsyncIteration:
+                pass
+            finally:
+                if logged:
+                    log.debug("%s done in %.6fs%s", msg, perf_counter() - start, suffix)
+
+    elif isgeneratorfunction(func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not (wrapper.enabled and log.isEnabledFor(logging.DEBUG)):
+                return (yield from func(*args, **kwargs))
+            log.debug("%s(%s)%s", msg, _Arguments(args, kwargs), suffix)
+            start = perf_counter()
+            try:
+                return (yield from func(*args, **kwargs))
+            finally:
+                log.debug("%s done in %.6fs%s", msg, perf_counter() - start, suffix)
+
+    else:
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not wrapper.enabled:
+                return func(*args, **kwargs)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("%s(%s)%s", msg, _Arguments(args, kwargs), suffix)
+            trace = _trace
+            if trace is None:
+                return func(*args, **kwargs)
+            trace.events[next(trace.ticks) & trace.mask] = (
+                "B", name, get_ident(), perf_counter_ns()
+            )
+            try:
+                return func(*args, **kwargs)
+            finally:
+                trace.events[next(trace.ticks) & trace.mask] = (
+                    "E", name, get_ident(), perf_counter_ns()
+                )
+
+    wrapper.enabled = _enabled
+    return wrapper
+
+
+def start_tracing(size=1 << 16):
+    """Record the calls of the enabled instrumented functions in a ring buffer
+
+    size: the number of events kept, rounded up to a power of 2
+    """
+    global _trace, _last_trace
+    _trace = _last_trace = _TraceBuffer(size)
+
+
+def stop_tracing():
+    """Stop recording calls, keeping the events recorded for export"""
+    global _trace
+    _trace = None
+
+
+def trace_events():
+    """Return the events of the last tracing as Chrome trace events"""
+    if _last_trace is None:
+        return []
+    pid = os.getpid()
+    events = []
+    for phase, name, tid, time_ns, *span in _last_trace.ordered_events():
+        event = {"name": name, "ph": phase, "ts": time_ns / 1000, "pid": pid, "tid": tid}
+        if span:
+            event.update(cat="async", id=span[0])
+        events.append(event)
+    return events
+
+
+def dump_trace(path):
+    """Write the events of the last tracing to a Chrome/Perfetto trace JSON file"""
+    with open(path, "w") as file:
+        json.dump({"traceEvents": trace_events(), "displayTimeUnit": "ns"}, file)
+
+
+class _LoggerQueueHandler(QueueHandler):
+    """The QueueHandler of a logger whose handlers were moved by start_queue_logging()
+
+    Records are formatted by the caller like with any QueueHandler, while the call
+    arguments are in their logged state, and only emitted by the listener thread.
+    """
+
+
+# The listener emitting the records queued by start_queue_logging()
+_listener = None
+
+
+def start_queue_logging(logger=None):
+    """
+    Move the handlers of a logger to a background thread
+
+    The logger only puts its records in a queue, so that logging never blocks its
+    caller, such as an event loop, on I/O.
+
+    logger: the root logger if None
+    """
+    global _listener
+    if _listener is not None:
+        raise RuntimeError("Queue logging is already started")
+    logger = logging.getLogger() if logger is None else logger
+    queue = SimpleQueue()
+    _listener = QueueListener(queue, *logger.handlers, respect_handler_level=True)
+    _listener.logger = logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(_LoggerQueueHandler(queue))
+    _listener.start()
+
+
+def stop_queue_logging():
+    """Emit the queued records and give their handlers back to the logger"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    logger = _listener.logger
+    for handler in list(logger.handlers):
+        if isinstance(handler, _LoggerQueueHandler):
+            logger.removeHandler(handler)
+    for handler in _listener.handlers:
+        logger.addHandler(handler)
+    _listener = None
 
 
 def debug(func=None, *, prefix="", suffix=""):
     """
-    Print the function signature and return the original function
+    Log the function calls while debugging is enabled and return the wrapper
 
     func: the function to be decorated
     """
     if func is None:
         return partial(debug, prefix=prefix, suffix=suffix)
-
-    # if "DEBUG" not in os.environ:
-    #     return func
-    # log = logging.getLogger(func.__module__)
-    msg = prefix + func.__qualname__
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # log.debug("%s(%s, %s)", msg, args, kwargs)
-        # args_str = ", ".join(map(repr, args))
-        # kwargs_str = ", ".join(f"{k}={v!r}" for k, v in kwargs.items())
-        # args_kwargs_str = ", ".join(filter(None, (args_str, kwargs_str)))
-        # print(f"{msg}({args_kwargs_str}) {suffix}")
-        print(msg + suffix)
-        return func(*args, **kwargs)
-
+    wrapper = _wrap(func, prefix, suffix)
+    _functions.add(wrapper)
     return wrapper
 
 
 def debugmethods(cls):
-    """Add debugging to all methods of a class"""
-    for name, val in vars(cls).items():
-        if callable(val):
-            setattr(cls, name, debug(val))
+    """Add debugging to all methods of a class, installed only while enabled"""
+    cls.__debug_methods__ = {
+        name: (val, _wrap(val, "", "")) for name, val in vars(cls).items() if callable(val)
+    }
+    _classes.add(cls)
+    _switch_class(cls, _enabled)
     return cls
 
 
-def debugattr(cls):
-    """Add debugging to all attributes of a class"""
+def _switch_class(cls, enabled, names=()):
+    """Install the debugging wrappers or the original methods of a class"""
+    methods = cls.__dict__["__debug_methods__"]
+    for name in names or methods:
+        if name in methods:
+            func, wrapper = methods[name]
+            wrapper.enabled = enabled
+            setattr(cls, name, wrapper if enabled else func)
+
+
+def _switch(target, names, enabled):
+    """Switch debugging globally, of a class hierarchy or of a function"""
+    global _enabled
+    if target is None:
+        _enabled = enabled
+        for function in _functions:
+            function.enabled = enabled
+        for cls in _classes:
+            _switch_class(cls, enabled)
+    elif target in _classes:
+        missing = set(names) - target.__debug_methods__.keys()
+        if missing:
+            raise AttributeError(
+                f"{', '.join(sorted(missing))} not instrumented in {target.__name__}"
+            )
+        pending = [target]
+        while pending:
+            cls = pending.pop()
+            if cls in _classes:
+                _switch_class(cls, enabled, names)
+            pending.extend(type.__subclasses__(cls))
+    elif target in _functions:
+        target.enabled = enabled
+    else:
+        raise TypeError(f"{target!r} is not instrumented for debugging")
+
+
+def enable(target=None, *names):
+    """
+    Enable debugging
+
+    target: a class instrumented with debugmethods or DebugMeta, including its
+    subclasses, or a function decorated with debug. Everything if None
+    names: the methods of the class to enable, all if empty
+    """
+    _switch(target, names, True)
+
+
+def disable(target=None, *names):
+    """Disable debugging, with the same arguments as enable()"""
+    _switch(target, names, False)
+
+
+class AttributeTracer:
+    """Sampled reads of the attributes of a class
+
+    counts: the sampled reads per attribute name, the names beyond max_names counted
+    together under "<other>"
+    recent: the last sampled reads as (name, filename, line number, function) of
+    their caller
+    With a window, reads are only sampled during windows of that many seconds opened
+    every interval seconds, the class having its own __getattribute__ in between. The
+    first window opens right away and a daemon thread reopens them once it closes.
+    Sampling can be paused to give the class back its own __getattribute__.
+    """
+
+    def __init__(self, cls, every=100, size=256, max_names=64, window=None, interval=1.0):
+        self.cls = cls
+        self.orig_getattribute = cls.__dict__.get("__getattribute__")
+        self.getattribute = None
+        self.every = every
+        self.max_names = max_names
+        self.window = window
+        self.interval = interval
+        self.window_end = float("inf")
+        self.counts = {}
+        self.recent = deque(maxlen=size)
+        self._stopped = Event()
+        self._lock = Lock()
+        self._thread = None
+
+    def record(self, name, frame):
+        """Record a sampled read of an attribute by the code of a frame"""
+        counts = self.counts
+        if name not in counts and len(counts) >= self.max_names:
+            name = "<other>"
+        counts[name] = counts.get(name, 0) + 1
+        code = frame.f_code
+        self.recent.append((name, code.co_filename, frame.f_lineno, code.co_qualname))
+        if perf_counter() >= self.window_end:
+            self._close_window()
+
+    def hot(self, n=10):
+        """Return the n most read attributes with their estimated number of reads"""
+        scale = self.every * (self.interval / self.window if self.window else 1)
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [(name, round(sampled * scale)) for name, sampled in ranked[:n]]
+
+    def reset(self):
+        """Clear the sampled reads"""
+        self.counts.clear()
+        self.recent.clear()
+
+    # _install() and _remove() are called with self._lock held, as windows are closed
+    # by the threads reading the attributes and opened by the thread reopening them
+
+    def _install(self):
+        self.cls.__getattribute__ = self.getattribute
+
+    def _remove(self):
+        if self.orig_getattribute is None:
+            try:
+                del self.cls.__getattribute__
+            except AttributeError:
+                pass  # Already removed
+        else:
+            self.cls.__getattribute__ = self.orig_getattribute
+
+    def _open_window(self):
+        with self._lock:
+            if not self._stopped.is_set():
+                self.window_end = perf_counter() + self.window
+                self._install()
+
+    def _close_window(self):
+        with self._lock:
+            self.window_end = float("inf")
+            self._remove()
+            if self._thread is None and not self._stopped.is_set():
+                self._thread = Thread(
+                    target=self._reopen_windows,
+                    args=(self._stopped,),
+                    name=f"debugattr-{self.cls.__name__}",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _reopen_windows(self, stopped):
+        while not stopped.wait(self.interval):
+            self._open_window()
+
+    def pause(self):
+        """Stop sampling, leaving attribute reads at their usual cost"""
+        with self._lock:
+            self._stopped.set()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self.window_end = float("inf")
+            self._remove()
+
+    def resume(self):
+        """Start sampling again"""
+        self._stopped = Event()
+        if self.window is None:
+            with self._lock:
+                self._install()
+        else:
+            self._open_window()
+
+
+def debugattr(
+    cls=None, *, every=100, size=256, max_names=64, window=0.01, interval=1.0
+):
+    """
+    Sample one attribute read out of every of the instances of a class
+
+    The AttributeTracer of the sampled reads is the __attribute_tracer__ of the class.
+    Unsampled reads only advance a counter, and only during the sampling windows of
+    window seconds every interval seconds, or all the time if window is None.
+    """
+    if cls is None:
+        return partial(
+            debugattr,
+            every=every,
+            size=size,
+            max_names=max_names,
+            window=window,
+            interval=interval,
+        )
     orig_getattribute = cls.__getattribute__
+    tracer = AttributeTracer(cls, every, size, max_names, window, interval)
+    reads = count()
 
     def __getattribute__(self, name):
-        print(f"Getting {name}")
+        if next(reads) % every:
+            return orig_getattribute(self, name)
+        tracer.record(name, sys._getframe(1))
         return orig_getattribute(self, name)
 
-    cls.__getattribute__ = __getattribute__
+    tracer.getattribute = __getattribute__
+    tracer.resume()
+    cls.__attribute_tracer__ = tracer
     return cls
 
 
@@ -75,7 +497,22 @@ class Spam(metaclass=DebugMeta):
         """foo method"""
 
 
-@debugattr
+@debug
+async def fetch(delay):
+    """Asynchronous function"""
+    await asyncio.sleep(delay)
+    return delay
+
+
+@debug
+def countdown(n):
+    """Generator function"""
+    while n:
+        yield n
+        n -= 1
+
+
+@debugattr(every=10, window=0.01, interval=0.05)
 class Person:
     """Person class"""
 
@@ -84,10 +521,42 @@ class Person:
         self.age = age
 
 
-add(y=1, x=2)
+def main():
+    """Main function"""
+
+    logging.basicConfig(level=logging.DEBUG)
+    start_queue_logging()
+    enable()
+
+    add(y=1, x=2)
+
+    a = Spam()
+    a.bar()
+    disable(Spam)
+    a.foo()
+
+    b = Person("Bob", 42)
+    end = perf_counter() + 0.2
+    while perf_counter() < end:
+        b.name, b.age, b.age
+    Person.__attribute_tracer__.pause()
+    print(Person.__attribute_tracer__.hot())
+    print(Person.__attribute_tracer__.recent[-1])
+
+    asyncio.run(fetch(0.01))
+    print(list(countdown(3)))
+    stop_queue_logging()
+
+    logging.getLogger().setLevel(logging.INFO)
+    enable(Spam)
+    start_tracing()
+    for _ in range(3):
+        a.bar()
+        add(1, 2)
+    asyncio.run(fetch(0.01))
+    stop_tracing()
+    print(trace_events()[:2])
 
-a = Spam()
-a.bar()
 
-b = Person("Bob", 42)
-print(b.name, b.age)
+if __name__ == "__main__":
+    main()
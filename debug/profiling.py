@@ -0,0 +1,199 @@
+import json
+import threading
+from functools import wraps
+from time import perf_counter_ns
+from weakref import finalize
+
+# Number of latency histogram buckets, bucket i counting calls lasting less than
+# 2**i ns and at least half of it, the last one every longer call
+BUCKETS = 40
+
+# The statistics of every running thread by id, merged on read, and the ones of the
+# finished threads merged together
+_lock = threading.Lock()
+_threads_stats = {}
+_finished_stats = {}
+
+
+class _ThreadAlive:
+    """An object referenced by the thread-local data only, freed when its thread ends"""
+
+
+def _merge_stats(merged, stats):
+    """Add statistics of profiled functions to merged ones"""
+    for name, (calls, total, self_time, histogram) in stats.items():
+        record = merged.get(name)
+        if record is None:
+            record = merged[name] = [0, 0, 0, [0] * BUCKETS]
+        record[0] += calls
+        record[1] += total
+        record[2] += self_time
+        record[3] = list(map(sum, zip(record[3], histogram)))
+
+
+def _thread_finished(stats):
+    """Merge the statistics of a finished thread into the finished ones"""
+    with _lock:
+        if _threads_stats.pop(id(stats), None) is not None:
+            _merge_stats(_finished_stats, stats)
+
+
+class _ProfileData(threading.local):
+    """Profiling accumulators of a thread, updated without lock"""
+
+    def __init__(self):
+        # Time spent in profiled callees of each running profiled call, in ns
+        self.stack = []
+        # [calls, total ns, self ns, histogram] per profiled function
+        self.stats = {}
+        with _lock:
+            _threads_stats[id(self.stats)] = self.stats
+        # Its statistics are moved to the finished ones when the thread ends, so that
+        # threads coming and going don't accumulate
+        self.alive = _ThreadAlive()
+        finalize(self.alive, _thread_finished, self.stats)
+
+
+_data = _ProfileData()
+
+
+def profile(func):
+    """Record the calls, total and self time and latency histogram of a function"""
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        data = _data
+        stack = data.stack
+        stack.append(0)
+        start = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter_ns() - start
+            callees = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record = data.stats.get(name)
+            if record is None:
+                record = data.stats[name] = [0, 0, 0, [0] * BUCKETS]
+            record[0] += 1
+            record[1] += elapsed
+            record[2] += elapsed - callees
+            record[3][min(elapsed.bit_length(), BUCKETS - 1)] += 1
+
+    return wrapper
+
+
+def profilemethods(cls):
+    """Add profiling to all methods of a class"""
+    for name, val in vars(cls).items():
+        if callable(val):
+            setattr(cls, name, profile(val))
+    return cls
+
+
+class ProfileMeta(type):
+    """Add profiling to all methods of child classes"""
+
+    def __new__(cls, clsname, bases, clsdict):
+        clsobj = super().__new__(cls, clsname, bases, clsdict)
+        clsobj = profilemethods(clsobj)
+        return clsobj
+
+
+def snapshot():
+    """Return the statistics of the profiled functions merged from all threads
+
+    Times are in seconds, histogram[i] is the number of calls lasting less than
+    2**i ns and at least half of it.
+    """
+    with _lock:
+        threads_stats = list(_threads_stats.values())
+        merged = {}
+        _merge_stats(merged, _finished_stats)
+    for stats in threads_stats:
+        _merge_stats(merged, stats.copy())
+    return {
+        name: {
+            "calls": calls,
+            "total": total / 1e9,
+            "self": self_time / 1e9,
+            "histogram": histogram,
+        }
+        for name, (calls, total, self_time, histogram) in merged.items()
+    }
+
+
+def reset():
+    """Clear the statistics of all threads"""
+    with _lock:
+        for stats in _threads_stats.values():
+            stats.clear()
+        _finished_stats.clear()
+
+
+def report(format="text"):
+    """Return a report of the profiled functions sorted by total time
+
+    format: "text" for a table, "json" for a list of the snapshot() entries with their
+    function name and their histogram as [upper bound in ns, calls] nonempty buckets
+    """
+    entries = sorted(snapshot().items(), key=lambda item: item[1]["total"], reverse=True)
+    if format == "json":
+        return json.dumps(
+            [
+                {
+                    "function": name,
+                    **entry,
+                    "histogram": [
+                        [2**i, count] for i, count in enumerate(entry["histogram"]) if count
+                    ],
+                }
+                for name, entry in entries
+            ],
+            indent=2,
+        )
+    if format != "text":
+        raise ValueError(f"Unknown report format {format!r}")
+
+    lines = [f"{'function':<50} {'calls':>10} {'total (s)':>12} {'self (s)':>12} {'mean (us)':>12}"]
+    for name, entry in entries:
+        mean = entry["total"] / entry["calls"] * 1e6
+        lines.append(
+            f"{name:<50} {entry['calls']:>10} {entry['total']:>12.6f} {entry['self']:>12.6f} {mean:>12.3f}"
+        )
+    return "\n".join(lines)
+
+
+class Spam(metaclass=ProfileMeta):
+    """Spam class"""
+
+    def bar(self):
+        """bar method"""
+        for _ in range(3):
+            self.foo()
+
+    def foo(self):
+        """foo method"""
+        sum(range(1000))
+
+
+@profile
+def add(x, y):
+    """Add function"""
+    return x + y
+
+
+def main():
+    """Main function"""
+
+    a = Spam()
+    for _ in range(1000):
+        a.bar()
+        add(1, 2)
+    print(report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,164 @@
+from functools import lru_cache
+from inspect import Parameter, signature
+
+
 def overload(f):
     """Mark a function as overloaded."""
     f.__overloads__ = True
     return f
 
 
-def is_subdict(subdict, dictionary):
-    """Check if a dictionary is a subset of another"""
-    return dictionary | subdict == dictionary
-
-
-def dict_slicing(dictionary, start=None, end=None):
-    """Return a slice of a dictionary"""
-    return {
-        key: value
-        for key, value in dictionary.items()
-        if key in tuple(dictionary.keys())[start:end]
+# Default value of the parameters of generated dispatchers for missing arguments
+_MISSING = object()
+
+# Largest number of types of a branch checked one after another instead of bisected
+_MAX_TYPE_CHAIN = 4
+
+
+def _bind(bindings, prefix, value):
+    """Add a value to the bindings of generated code and return its name"""
+    name = f"{prefix}{len(bindings)}"
+    bindings[name] = value
+    return name
+
+
+def _make_decision(candidates, positions, depth, lines, bindings, fallback):
+    """Add the lines of a node of a dispatch decision tree
+
+    candidates are the (function, argument types) pairs matching the types checked by
+    the parent nodes and positions the indexes of the arguments left to check.
+    """
+    indent = "    " * depth
+    if not positions:
+        for func, types in candidates:
+            name = _bind(bindings, "_f", func)
+            call = f"{name}(self{''.join(f', _a{i}' for i in range(len(types)))})"
+            if not fallback:
+                lines.append(f"{indent}return {call}")
+                return
+            lines.append(f"{indent}try:")
+            lines.append(f"{indent}    return {call}")
+            lines.append(f"{indent}except TypeError:")
+            lines.append(f"{indent}    pass")
+        return
+
+    # Branch on the argument distinguishing the most candidates first
+    position = max(positions, key=lambda p: len({types[p] for _, types in candidates}))
+    rest = [p for p in positions if p != position]
+    groups = {}
+    for func, types in candidates:
+        groups.setdefault(types[position], []).append((func, types))
+    lines.append(f"{indent}t{position} = type(_a{position})")
+    if len(groups) <= _MAX_TYPE_CHAIN:
+        keyword = "if"
+        for arg_type, group in groups.items():
+            name = _bind(bindings, "_T", arg_type)
+            lines.append(f"{indent}{keyword} t{position} is {name}:")
+            _make_decision(group, rest, depth + 1, lines, bindings, fallback)
+            keyword = "elif"
+        return
+
+    # Bisect on the index of the argument type for long branches
+    index = {arg_type: i for i, arg_type in enumerate(groups)}
+    groups = list(groups.values())
+    name = _bind(bindings, "_I", index)
+    lines.append(f"{indent}i{position} = {name}.get(t{position}, -1)")
+    lines.append(f"{indent}if i{position} >= 0:")
+
+    def bisect(low, high, depth):
+        if high - low == 1:
+            _make_decision(groups[low], rest, depth, lines, bindings, fallback)
+            return
+        middle = (low + high) // 2
+        lines.append(f"{'    ' * depth}if i{position} < {middle}:")
+        bisect(low, middle, depth + 1)
+        lines.append(f"{'    ' * depth}else:")
+        bisect(middle, high, depth + 1)
+
+    bisect(0, len(groups), depth + 1)
+
+
+def _make_dispatcher(name, signatures, keywords=(), var_keyword=False, fallback=False):
+    """Make the method dispatching its arguments to the matching overload
+
+    Positional arguments are positional-only parameters defaulting to _MISSING, and
+    go through a decision tree on the arity, then on the exact types of the
+    arguments. The keywords of the overloads follow as parameters defaulting to
+    _MISSING too, so that positional calls make no tuple or dict of extra arguments,
+    the dict of any other keyword arguments only being taken with var_keyword. They
+    are not keyword-only, whose defaults are looked up on each call, so extra
+    positional arguments fill them. Calls with keyword or extra arguments are passed
+    to _call_with_keywords and _no_overload makes the error raised if no overload
+    matches. With fallback, a TypeError raised by an overload makes it try the next
+    matching one.
+    """
+    bindings = {"_MISSING": _MISSING}
+    max_arity = max((len(types) for _, types, _, _ in signatures), default=0)
+    parameters = [f"_a{i}" for i in range(max_arity)]
+    header = f"def {name}(self, {''.join(f'{p}=_MISSING, ' for p in parameters)}/"
+    if keywords:
+        header += f", {', '.join(f'{keyword}=_MISSING' for keyword in keywords)}"
+    header += ", **_kwargs):" if var_keyword else "):"
+    passed = [f"{keyword} is not _MISSING" for keyword in keywords]
+    if var_keyword:
+        passed.append("_kwargs")
+    kwargs = ", ".join(f"{keyword!r}: {keyword}" for keyword in keywords)
+    kwargs = f"{{{kwargs}, **_kwargs}}" if var_keyword else f"{{{kwargs}}}"
+    lines = [header]
+    if passed:
+        lines.append(f"    if {' or '.join(passed)}:")
+        lines.append(
+            f"        return _call_with_keywords(self, ({''.join(f'{p}, ' for p in parameters)}), {kwargs})"
+        )
+    arities = {
+        arity
+        for _, types, _, required in signatures
+        for arity in range(required, len(types) + 1)
     }
+    keyword = "if"
+    for arity in range(max_arity, -1, -1):
+        if arity:
+            lines.append(f"    {keyword} _a{arity - 1} is not _MISSING:")
+        else:
+            lines.append("    else:" if max_arity else "    if True:")
+        keyword = "elif"
+        if arity not in arities:
+            lines.append("        pass")
+            continue
+        candidates = [
+            (func, types[:arity])
+            for func, types, _, required in signatures
+            if required <= arity <= len(types)
+        ]
+        _make_decision(candidates, list(range(arity)), 2, lines, bindings, fallback)
+    lines.append(
+        f"    raise _no_overload(({''.join(f'{p}, ' for p in parameters)}))"
+    )
+    return "\n".join(lines) + "\n", bindings
+
+
+def _keywords(funcs):
+    """Return the names of the parameters of methods which can be passed by keyword,
+    and whether one of them takes any keyword argument
+    """
+    keywords = {}
+    var_keyword = False
+    for func in funcs:
+        for parameter in list(signature(func).parameters.values())[1:]:  # Without self
+            if parameter.kind in (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY):
+                keywords[parameter.name] = None
+            var_keyword = var_keyword or parameter.kind is Parameter.VAR_KEYWORD
+    return list(keywords), var_keyword
+
+
+def _required_args(func):
+    """Return the number of positional arguments without default of a method"""
+    parameters = list(signature(func).parameters.values())[1:]  # Without self
+    positional = (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)
+    return sum(
+        parameter.default is Parameter.empty and parameter.kind in positional
+        for parameter in parameters
+    )
 
 
 class OverloadList(list):
@@ -23,63 +166,83 @@ class OverloadList(list):
 
 
 class OverloadFunctions:
-    """A class representing overloaded functions of a class"""
+    """A class representing overloaded functions of a class
 
-    def __set_name__(self, owner, name):
-        self.name = name
-        self.owner = owner
-        self.fullname = self.owner.__name__ + "." + self.name
+    Its method is a plain function standing for the overloads in the class, so that
+    instances bind it like any other method, without allocation per call. Called on
+    the class, its first argument is always the self passed to the overloads.
+    """
 
-    def __init__(self, overload_list):
+    def __init__(self, overload_list, fullname, cache_size=128, fallback=False):
         self.overload_list = overload_list
-
-    def __get__(self, instance, owner):
-        if instance is None:
-            return self
-        return BoundOverloadedMethod(
-            self.overload_list, instance, owner, self.name, self.fullname
+        self.fullname = fullname
+        self.name = fullname.rpartition(".")[2]
+        self.fallback = fallback
+        # The annotations of each overload, as positional types and (name, type) items,
+        # and its number of required arguments
+        self.signatures = []
+        for func in overload_list:
+            items = tuple(
+                item for item in func.__annotations__.items() if item[0] != "return"
+            )
+            types = tuple(arg_type for _, arg_type in items)
+            self.signatures.append((func, types, items, _required_args(func)))
+        # Positional calls go through a generated decision tree, calls with keyword
+        # arguments through a cache of the matching overloads, with cache_info() stats
+        self.resolve = lru_cache(maxsize=cache_size)(self._match)
+        keywords, var_keyword = _keywords(overload_list)
+        source_code, bindings = _make_dispatcher(
+            self.name, self.signatures, keywords, var_keyword, fallback
         )
+        bindings["_call_with_keywords"] = self._call_with_keywords
+        bindings["_no_overload"] = self._no_overload
+        namespace = {}
+        exec(source_code, bindings, namespace)
+        self.method = namespace[self.name]
+        self.method.__qualname__ = fullname
+        self.method.__module__ = overload_list[0].__module__
+        self.method.__doc__ = overload_list[0].__doc__
+        self.method.overloads = self
 
     def __repr__(self):
         hex_id = str(hex(id(self)))[2:]
         full_id = "0x" + f"{hex_id.upper():0>16}"
         return f"<{self.__class__.__name__} {self.fullname} at {full_id}>"
 
-    def __call__(self, *args, **kwargs):
-        args = args[1:] if args[0] == self.owner else args
-        args_len = len(args)
-        args_types = [type(arg) for arg in args]
-        kwargs_types = {key: type(value) for key, value in kwargs.items()}
-
-        for func in self.overload_list:
-            func_args = func.__annotations__
-            func_arg_types = list(func_args.values())[:args_len]
-            func_kwargs_types = dict_slicing(func_args, args_len)
-
-            if args_types == func_arg_types and is_subdict(
-                kwargs_types, func_kwargs_types
-            ):
-                try:
-                    return func(self.owner, *args, **kwargs)
-                except TypeError:
-                    pass
-        raise TypeError(
-            f"No overload for {self.fullname}({self.owner.__name__}, {', '.join(map(repr, args))})"
+    def _match(self, args_types, kwargs_types):
+        """Return the overloads whose annotations match the types of the arguments"""
+        args_len = len(args_types)
+        return tuple(
+            func
+            for func, func_arg_types, func_items, _ in self.signatures
+            if func_arg_types[:args_len] == args_types
+            and kwargs_types <= frozenset(func_items[args_len:])
         )
 
-
-class BoundOverloadedMethod(OverloadFunctions):
-    """A class representing bound overloaded methods of an instance"""
-
-    def __init__(self, overload_list, instance, owner, name, fullname):
-        self.overload_list = overload_list
-        self.instance = instance
-        self.owner = owner
-        self.name = name
-        self.fullname = fullname
-
-    def __repr__(self):
-        return f"<{self.__class__.__name__} {self.fullname} of {self.instance}>"
+    def cache_info(self):
+        """Return the hits, misses and size of the overload resolution cache"""
+        return self.resolve.cache_info()
+
+    def _call_with_keywords(self, instance, args, kwargs):
+        """Call the overload matching arguments including keyword ones"""
+        args = tuple(arg for arg in args if arg is not _MISSING)
+        kwargs = {key: value for key, value in kwargs.items() if value is not _MISSING}
+        args_types = tuple(map(type, args))
+        kwargs_types = frozenset((key, type(value)) for key, value in kwargs.items())
+        for func in self.resolve(args_types, kwargs_types):
+            if not self.fallback:
+                return func(instance, *args, **kwargs)
+            try:
+                return func(instance, *args, **kwargs)
+            except TypeError:
+                pass
+        raise self._no_overload(args, kwargs)
+
+    def _no_overload(self, args, kwargs={}):
+        """Return the error raised when no overload matches the arguments"""
+        args = tuple(arg for arg in args if arg is not _MISSING)
+        arguments = [*map(repr, args), *(f"{k}={v!r}" for k, v in kwargs.items())]
+        return TypeError(f"No overload for {self.fullname}({', '.join(arguments)})")
 
 
 class OverloadDict(dict):
@@ -114,9 +277,16 @@ class OverloadMeta(type):
     def __prepare__(cls, name, bases, **kwds):
         return OverloadDict()
 
-    def __new__(cls, name, bases, clsdict, **kwds):
+    def __new__(cls, name, bases, clsdict, cache_size=128, fallback=False, **kwds):
+        qualname = clsdict.get("__qualname__", name)
         overload_clsdict = {
-            key: OverloadFunctions(value) if isinstance(value, OverloadList) else value
+            key: (
+                OverloadFunctions(
+                    value, f"{qualname}.{key}", cache_size, fallback
+                ).method
+                if isinstance(value, OverloadList)
+                else value
+            )
             for key, value in clsdict.items()
         }
         return super().__new__(cls, name, bases, overload_clsdict, **kwds)
@@ -139,8 +309,17 @@ class Overload(OverloadBase):
         print("OverloadFunctions function f with x: str, y: str")
 
 
-test = Overload()
-# print(Overload.f)
-# print(test.f)
-Overload.f(Overload, "a", 2)
-test.f("a", "b")
+def main():
+    """Main function"""
+
+    test = Overload()
+    # print(Overload.f)
+    # print(test.f)
+    Overload.f(Overload, "a", 2)
+    test.f("a", "b")
+    test.f("a", "b")
+    # print(Overload.f.overloads.cache_info())
+
+
+if __name__ == "__main__":
+    main()
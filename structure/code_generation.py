@@ -1,26 +1,36 @@
 import re
+from functools import lru_cache, partial
 from numbers import Number
-from time import time
-
-
-def _make_init(fields):
-    """Make an __init__ method given a list of field names"""
-
-    source_code = f'def __init__(self, {", ".join(fields)}):\n'
-    for field in fields:
-        source_code += f"    self.{field} = {field}\n"
-    return source_code
-
-
-def _make_setter(descriptor_class):
-    """Make a __set__ method for a descriptor class"""
-
-    source_code = "def __set__(self, instance, value):\n"
-    for descriptor in descriptor_class.__mro__:
-        if "set_code" in descriptor.__dict__:
-            for line in descriptor.set_code():
-                source_code += f"    {line}\n"
-    return source_code
+from weakref import WeakValueDictionary
+
+try:
+    from .codegen import (
+        NoDuplicatesDict,
+        StructArray,
+        StructRow,
+        StructureBase,
+        _make_frozen_access,
+        _make_fused_init,
+        _make_init,
+        _make_interned_new,
+        _make_setter,
+        _make_slots_access,
+        _make_validator,
+    )
+except ImportError:  # Run as a script
+    from codegen import (
+        NoDuplicatesDict,
+        StructArray,
+        StructRow,
+        StructureBase,
+        _make_frozen_access,
+        _make_fused_init,
+        _make_init,
+        _make_interned_new,
+        _make_setter,
+        _make_slots_access,
+        _make_validator,
+    )
 
 
 class DescriptorMeta(type):
@@ -40,10 +50,19 @@ class DescriptorMeta(type):
 class Descriptor(metaclass=DescriptorMeta):
     """Implement the descriptor protocol for class attributes"""
 
-    def __init__(self, name=None, **kwargs):
+    # LRU cache of the values known to be valid, made with the cache=<maxsize> argument
+    cache = None
+
+    def __init__(self, name=None, cache=None, **kwargs):
         self.name = name
         for key, value in kwargs.items():
             setattr(self, key, value)
+        if cache:
+            # Values of different types are cached separately, so 1 and True don't mix
+            namespace = {}
+            exec(_make_validator(type(self)), globals(), namespace)
+            validate = partial(namespace["validate"], self)
+            self.cache = lru_cache(maxsize=cache, typed=True)(validate)
 
     @staticmethod
     def set_code():
@@ -74,6 +93,18 @@ class NumberChecked(Typed):
     expected_type = Number
 
 
+class Integer(Typed):
+    """An integer checking descriptor"""
+
+    expected_type = int
+
+
+class Float(Typed):
+    """A float checking descriptor"""
+
+    expected_type = float
+
+
 class String(Typed):
     """A string checking descriptor"""
 
@@ -133,15 +164,6 @@ class SizedRegexString(SizedString, Regex):
     """A string of a fixed size matching a regular expression"""
 
 
-class NoDuplicatesDict(dict):
-    """A dictionary that prevents duplicate keys"""
-
-    def __setitem__(self, key, value):
-        if key in self:
-            raise ValueError(f"{key} already defined")
-        super().__setitem__(key, value)
-
-
 class StructMeta(type):
     """Metaclass for all structure"""
 
@@ -149,21 +171,66 @@ class StructMeta(type):
     def __prepare__(cls, name, bases, **kwargs):
         return NoDuplicatesDict()
 
-    def __new__(cls, name, bases, clsdict):
+    def __new__(
+        cls, name, bases, clsdict, fused=False, slots=False, frozen=False, intern=False
+    ):
+        if intern and not frozen:
+            raise TypeError("Only frozen structures can be interned")
         fields = [
             key for key, value in clsdict.items() if isinstance(value, Descriptor)
         ]
         for field in fields:
             clsdict[field].name = field
-
+        descriptors = {field: clsdict[field] for field in fields}
         if fields:
+            clsdict["_fields"] = descriptors
+
+        for base in bases:
+            if fields and getattr(base, "_frozen", False):
+                # Their fields would be set through the __setattr__() refusing it
+                raise TypeError(f"{name} can't add fields to frozen {base.__name__}")
+
+        if fields and slots:
+            # The slot members replace the descriptors as class attributes,
+            # so validation is moved into a generated __setattr__()
+            for field in fields:
+                del clsdict[field]
+            clsdict["__slots__"] = (
+                tuple(fields)
+                + (("_hash",) if frozen else ())
+                + (("__weakref__",) if intern else ())
+            )
+            if not frozen:
+                source_code, bindings = _make_slots_access(descriptors)
+                exec(source_code, bindings, clsdict)
+
+        if fields and frozen:
+            # Frozen structures store their fields without going through __setattr__()
+            clsdict["_frozen"] = True
+            source_code, bindings = _make_frozen_access(fields, slots)
+            exec(source_code, bindings, clsdict)
+
+        if fields and intern:
+            # Equal instances are shared, a new one being made by __new__ only if
+            # none is alive, and object.__init__ ignores the arguments
+            pool = clsdict["_pool"] = WeakValueDictionary()
+            source_code, bindings = _make_interned_new(descriptors, slots)
+            bindings["_pool"] = pool
+            exec(source_code, bindings, clsdict)
+        elif fields and (fused or frozen):
+            # Validate and store the fields in __init__ without going through __set__()
+            source_code, bindings = _make_fused_init(descriptors, slots)
+            exec(source_code, bindings, clsdict)
+        elif fields:
             exec(_make_init(fields), globals(), clsdict)
         return super().__new__(cls, name, bases, clsdict)
 
 
-class Structure(metaclass=StructMeta):
+class Structure(StructureBase, metaclass=StructMeta):
     """A base class for other structure classes to inherit from"""
 
+    __slots__ = ()
+
 
 class Stock(Structure):
     """A stock holding structure with ticker symbol, name,
@@ -177,6 +244,46 @@ class Stock(Structure):
     price = PositiveNumber()
 
 
+class FusedStock(Structure, fused=True):
+    """A stock holding structure validating its fields directly in __init__"""
+
+    ticker = SizedRegexString(pattern="[A-Z]+$", maxlen=10)
+    name = SizedString(maxlen=10)
+    shares = PositiveNumber()
+    price = PositiveNumber()
+
+
+class SlottedStock(Structure, fused=True, slots=True):
+    """A stock holding structure storing its fields in __slots__"""
+
+    ticker = SizedRegexString(pattern="[A-Z]+$", maxlen=10)
+    name = SizedString(maxlen=10)
+    shares = PositiveNumber()
+    price = PositiveNumber()
+
+
+class Quote(Structure, frozen=True):
+    """An immutable, hashable stock quote"""
+
+    ticker = SizedRegexString(pattern="[A-Z]+$", maxlen=10)
+    price = PositiveNumber()
+
+
+class Venue(Structure, slots=True, frozen=True, intern=True):
+    """A trading venue, equal venues being the same instance"""
+
+    mic = SizedRegexString(pattern="[A-Z]+$", maxlen=4)
+    name = SizedString(maxlen=20)
+
+
+class Holding(Structure, fused=True):
+    """A stock holding with fixed-width binary records"""
+
+    ticker = SizedRegexString(pattern="[A-Z]+$", maxlen=10)
+    shares = Integer()
+    price = Float()
+
+
 class Stock2:
     """Simple stock structure with ticker symbol, name, shares owned and price for each share"""
 
@@ -187,13 +294,19 @@ class Stock2:
         self.shares = shares
 
 
-stock = Stock("MSFT", "Microsoft", 300, 10)
-stock.ticker = "AAPL"
-stock.name = "Apple"
-print(stock.ticker, stock.name, stock.shares, stock.price)
-start = time()
-for _ in range(1_000_000):
+def main():
+    """Main function"""
+
     stock = Stock("MSFT", "Microsoft", 300, 10)
-    # stock.ticker = "AAPL"
-    # stock.name = "Apple"
-print("Time taken:", time() - start)
+    stock.ticker = "AAPL"
+    stock.name = "Apple"
+    print(stock.ticker, stock.name, stock.shares, stock.price)
+    record = Holding("AAPL", 300, 10.0).to_bytes()
+    holding = Holding.from_bytes(memoryview(record), validate=True)
+    print(len(record), holding.ticker, holding.shares, holding.price)
+    quotes = {Quote("MSFT", 300), Quote("MSFT", 300), Quote("AAPL", 200)}
+    print(len(quotes), Venue("XNAS", "Nasdaq") is Venue("XNAS", "Nasdaq"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,667 @@
+import csv
+import logging
+import re
+from array import array
+from itertools import starmap
+from numbers import Number
+from struct import Struct
+
+_log = logging.getLogger(__name__)
+
+
+def _make_init(fields):
+    """Make an __init__ method given a list of field names"""
+
+    source_code = f'def __init__(self, {", ".join(fields)}):\n'
+    for field in fields:
+        source_code += f"    self.{field} = {field}\n"
+    return source_code
+
+
+def _make_field_check(field, descriptor, bindings, variable=None):
+    """Make the validation lines of a field checking the variable of the field, or the
+    given variable
+
+    The value checked by set_code() is renamed to the variable, so a field named value
+    doesn't clobber the others. Descriptor state referenced as self.<attr> (maxlen, pattern, ...) is renamed to
+    _<field>_<attr> and added to bindings, to be used as globals when executing the
+    source code.
+    """
+
+    def bind(match):
+        local = f"_{field}_{match[1]}"
+        bindings[local] = getattr(descriptor, match[1])
+        return local
+
+    variable = variable or field
+    if descriptor.cache is not None:
+        # Values which already passed validation are looked up in the cache instead
+        bindings[f"_{field}_cache"] = descriptor.cache
+        return [f"_{field}_cache({variable})"]
+    return [
+        re.sub(r"\bself\.(\w+)", bind, re.sub(r"\bvalue\b", variable, line))
+        for line in _validation_code(type(descriptor))
+    ]
+
+
+def _make_fused_init(descriptors, slots=False):
+    """Make an __init__ method that inlines the set_code() of each field's descriptor
+
+    The validated fields are stored directly into the instance __dict__, or into
+    their slots for slotted structures.
+    """
+
+    fields = list(descriptors)
+    bindings = {"_setattr": object.__setattr__}
+    source_code = f'def __init__(self, {", ".join(fields)}):\n'
+    for field, descriptor in descriptors.items():
+        for line in _make_field_check(field, descriptor, bindings):
+            source_code += f"    {line}\n"
+    source_code += _make_store(fields, slots)
+    return source_code, bindings
+
+
+def _make_store(fields, slots=False):
+    """Make the lines storing the validated fields in the instance self
+
+    Fields are stored one by one in their order, which keeps the instance __dict__
+    sharing its keys with the other instances of the class.
+    """
+
+    if slots:
+        return "".join(f"    _setattr(self, {field!r}, {field})\n" for field in fields)
+    return "    _dict = self.__dict__\n" + "".join(
+        f"    _dict[{field!r}] = {field}\n" for field in fields
+    )
+
+
+def _make_build(fields, slots=False, intern=False, cls="_structure"):
+    """Make the lines returning an instance of cls made of the validated fields
+
+    With intern, an instance of cls of fields equal and of the same types found in the
+    _pool WeakValueDictionary bound by the caller is returned instead, so 1.0 and True
+    don't turn into 1, and new instances are added to it. The pool being shared with
+    the subclasses of the structure, cls is part of the key.
+    """
+
+    if not intern:
+        return f"    self = _new({cls})\n" + _make_store(fields, slots) + "    return self\n"
+    store = "".join(
+        f"    {line}" for line in _make_store(fields, slots).splitlines(keepends=True)
+    )
+    return (
+        f'    _key = ({cls}, {"".join(f"{field}.__class__, {field}, " for field in fields)})\n'
+        "    self = _pool.get(_key)\n"
+        "    if self is None:\n"
+        f"        self = _new({cls})\n"
+        f"{store}"
+        "        _pool[_key] = self\n"
+        "    return self\n"
+    )
+
+
+def _to_number(text):
+    """Convert a string of digits to an int and other numeric strings to a float"""
+    return int(text) if text.isdigit() else float(text)
+
+
+# Conversions of string values in from_rows(), by expected type of the descriptors
+_COERCIONS = {int: "int", float: "float", Number: "_to_number"}
+
+
+def _make_coercion(field, descriptor):
+    """Make the lines converting a string value of a field to its expected type"""
+
+    conversion = _COERCIONS.get(getattr(descriptor, "expected_type", None))
+    if conversion is None:
+        return ""
+    return (
+        f"    if {field}.__class__ is str:\n"
+        f"        {field} = {conversion}({field})\n"
+    )
+
+
+def _make_row_parser(descriptors, slots=False, coerce=True, intern=False):
+    """Make a function building an instance of a structure from a row of field values
+
+    With coerce, string values of int and Number fields are converted first. The
+    instance is created with _new(_structure), _structure being bound by the caller,
+    and its fields are validated and stored like in the fused __init__. With intern,
+    instances are looked up in the _pool of the structure first.
+    """
+
+    fields = list(descriptors)
+    bindings = {
+        "_new": object.__new__,
+        "_setattr": object.__setattr__,
+        "_to_number": _to_number,
+    }
+    source_code = f'def parse({", ".join(fields)}):\n'
+    for field, descriptor in descriptors.items():
+        if coerce:
+            source_code += _make_coercion(field, descriptor)
+        for line in _make_field_check(field, descriptor, bindings):
+            source_code += f"    {line}\n"
+    source_code += _make_build(fields, slots, intern)
+    return source_code, bindings
+
+
+def _make_row_check(descriptors, coerce=False):
+    """Make a function validating the field values of a row, returned as a tuple
+
+    With coerce, string values of int and Number fields are converted first.
+    """
+
+    fields = list(descriptors)
+    bindings = {"_to_number": _to_number}
+    source_code = f'def check({", ".join(fields)}):\n'
+    for field, descriptor in descriptors.items():
+        if coerce:
+            source_code += _make_coercion(field, descriptor)
+        for line in _make_field_check(field, descriptor, bindings):
+            source_code += f"    {line}\n"
+    source_code += f'    return ({", ".join(fields)},)\n'
+    return source_code, bindings
+
+
+def _make_slots_access(descriptors):
+    """Make __setattr__ and __delattr__ methods validating the slots of a structure"""
+
+    bindings = {
+        "_fields": frozenset(descriptors),
+        "_setattr": object.__setattr__,
+        "_delattr": object.__delattr__,
+    }
+    source_code = "def __setattr__(self, name, value):\n"
+    keyword = "if"
+    for field, descriptor in descriptors.items():
+        source_code += f"    {keyword} name == {field!r}:\n"
+        lines = _make_field_check(field, descriptor, bindings, "value")
+        for line in lines or ["pass"]:
+            source_code += f"        {line}\n"
+        keyword = "elif"
+    source_code += "    _setattr(self, name, value)\n"
+    source_code += "def __delattr__(self, name):\n"
+    source_code += "    if name in _fields:\n"
+    source_code += "        raise AttributeError(\"Can't delete attribute\")\n"
+    source_code += "    _delattr(self, name)\n"
+    return source_code, bindings
+
+
+def _make_frozen_access(fields, slots=False):
+    """Make the methods of a frozen structure
+
+    __setattr__ and __delattr__ refuse any change, __eq__ compares the fields and
+    __hash__ is computed once, then cached in the _hash slot or __dict__ entry.
+    __reduce__ rebuilds instances through the constructor, which validates them.
+    """
+
+    def values(obj):
+        return f'({"".join(f"{obj}.{field}, " for field in fields)})'
+
+    source_code = (
+        "def __setattr__(self, name, value):\n"
+        "    raise AttributeError(f\"Can't set attribute {name!r} of frozen {type(self).__name__}\")\n"
+        "def __delattr__(self, name):\n"
+        "    raise AttributeError(f\"Can't delete attribute {name!r} of frozen {type(self).__name__}\")\n"
+        "def __eq__(self, other):\n"
+        "    if self is other:\n"
+        "        return True\n"
+        "    if other.__class__ is not self.__class__:\n"
+        "        return NotImplemented\n"
+        f"    return {values('self')} == {values('other')}\n"
+        "def __hash__(self):\n"
+    )
+    if slots:
+        source_code += (
+            "    try:\n"
+            "        return self._hash\n"
+            "    except AttributeError:\n"
+            f"        _setattr(self, '_hash', hash({values('self')}))\n"
+            "        return self._hash\n"
+        )
+    else:
+        source_code += (
+            "    try:\n"
+            "        return self.__dict__['_hash']\n"
+            "    except KeyError:\n"
+            f"        value = self.__dict__['_hash'] = hash({values('self')})\n"
+            "        return value\n"
+        )
+    source_code += "def __reduce__(self):\n"
+    source_code += f"    return self.__class__, {values('self')}\n"
+    return source_code, {"_setattr": object.__setattr__}
+
+
+def _make_interned_new(descriptors, slots=False):
+    """Make a __new__ method validating the fields like the fused __init__, which
+    returns the instance of equal fields from the _pool bound by the caller if any
+    """
+
+    fields = list(descriptors)
+    bindings = {"_new": object.__new__, "_setattr": object.__setattr__}
+    source_code = f'def __new__(cls, {", ".join(fields)}):\n'
+    for field, descriptor in descriptors.items():
+        for line in _make_field_check(field, descriptor, bindings):
+            source_code += f"    {line}\n"
+    source_code += _make_build(fields, slots, intern=True, cls="cls")
+    return source_code, bindings
+
+
+# struct formats of the fixed-width binary records, by expected type of the descriptors.
+# Number fields have none, as neither format round-trips both the ints and floats
+_STRUCT_FORMATS = {int: "q", float: "d"}
+
+
+def _struct_format(field, descriptor):
+    """Return the struct format of a field, strings taking maxlen bytes"""
+
+    expected_type = getattr(descriptor, "expected_type", None)
+    if expected_type is str and isinstance(getattr(descriptor, "maxlen", None), int):
+        return f"{descriptor.maxlen}s"
+    if expected_type in _STRUCT_FORMATS:
+        return _STRUCT_FORMATS[expected_type]
+    raise TypeError(
+        f"{field} has no fixed-width binary format, only int, float and str with a "
+        "maxlen fields have one"
+    )
+
+
+def _make_encoder(fields, formats):
+    """Make a to_bytes method packing the fields of an instance with _pack
+
+    Strings are encoded to UTF-8 and must fit in the width of their field.
+    """
+
+    source_code = "def to_bytes(self):\n"
+    for field, fmt in zip(fields, formats):
+        source_code += f"    {field} = self.{field}\n"
+        if fmt.endswith("s"):
+            width = int(fmt[:-1])
+            source_code += f"    {field} = {field}.encode()\n"
+            source_code += f"    if len({field}) > {width}:\n"
+            source_code += f"        raise ValueError(f'{{self.{field}!r}} exceeds {width} bytes for {field}')\n"
+    source_code += f'    return _pack({", ".join(fields)})\n'
+    return source_code
+
+
+def _make_decoder(fields, formats, slots=False, validate=False, intern=False):
+    """Make a function building an instance of a structure from unpacked field values
+
+    Strings are decoded without their padding. With validate, the instance is built by
+    the from_rows() parser _parse, otherwise with _new(_structure) and its fields are
+    stored as they are. _structure, _parse and _pool are bound by the caller.
+    """
+
+    bindings = {"_new": object.__new__, "_setattr": object.__setattr__}
+    source_code = f'def decode({", ".join(fields)}):\n'
+    for field, fmt in zip(fields, formats):
+        if fmt.endswith("s"):
+            source_code += f"    {field} = {field}.rstrip(b'\\0').decode()\n"
+    if validate:
+        source_code += f'    return _parse({", ".join(fields)})\n'
+    else:
+        source_code += _make_build(fields, slots, intern)
+    return source_code, bindings
+
+
+def _split_set_code(descriptor_class):
+    """Return the set_code() lines of a descriptor class as validating and storing lines
+
+    The storing lines are the ones of the base Descriptor, the last one in the __mro__.
+    """
+
+    code = [
+        descriptor.set_code()
+        for descriptor in descriptor_class.__mro__
+        if "set_code" in descriptor.__dict__
+    ]
+    return [line for lines in code[:-1] for line in lines], code[-1]
+
+
+def _validation_code(descriptor_class):
+    """Return the set_code() lines of a descriptor class without the storing lines"""
+
+    return _split_set_code(descriptor_class)[0]
+
+
+def _make_setter(descriptor_class):
+    """Make a __set__ method for a descriptor class"""
+
+    validation_code, storing_code = _split_set_code(descriptor_class)
+    source_code = "def __set__(self, instance, value):\n"
+    if validation_code:
+        # Descriptors with a cache of valid values check the value through it
+        source_code += "    if self.cache is None:\n"
+        for line in validation_code:
+            source_code += f"        {line}\n"
+        source_code += "    else:\n"
+        source_code += "        self.cache(value)\n"
+    for line in storing_code:
+        source_code += f"    {line}\n"
+    return source_code
+
+
+def _make_validator(descriptor_class):
+    """Make a validate function running the set_code() checks of a descriptor class"""
+
+    source_code = "def validate(self, value):\n"
+    for line in _validation_code(descriptor_class) or ["pass"]:
+        source_code += f"    {line}\n"
+    return source_code
+
+
+class NoDuplicatesDict(dict):
+    """A dictionary that prevents duplicate keys"""
+
+    def __setitem__(self, key, value):
+        if key in self:
+            raise ValueError(f"{key} already defined")
+        super().__setitem__(key, value)
+
+
+class StructureBase:
+    """The methods of the structures, whatever their metaclass and descriptors"""
+
+    # Allows slotted subclasses to do without a per-instance __dict__
+    __slots__ = ()
+
+    @classmethod
+    def array(cls, rows=()):
+        """Make a column-wise StructArray of the structure"""
+        return StructArray(cls, rows)
+
+    @classmethod
+    def from_rows(cls, rows, *, coerce=True, on_error=None):
+        """Lazily build validated instances from rows of field values
+
+        Bad rows are skipped and reported to on_error(lineno, row, exc), or logged.
+        """
+        return _parse_rows(cls, enumerate(rows, 1), coerce, on_error)
+
+    @classmethod
+    def from_csv(cls, path, *, coerce=True, header=True, on_error=None, **fmtparams):
+        """Lazily build validated instances from the rows of a CSV file
+
+        The columns must be in the order of the fields. Bad rows are skipped and
+        reported with their line number like in from_rows().
+        """
+        with open(path, newline="") as file:
+            reader = csv.reader(file, **fmtparams)
+            if header:
+                next(reader, None)
+            numbered_rows = ((reader.line_num, row) for row in reader)
+            yield from _parse_rows(cls, numbered_rows, coerce, on_error)
+
+    def to_bytes(self):
+        """Pack the fields into a fixed-width little-endian binary record"""
+        return _codec(type(self))[1](self)
+
+    @classmethod
+    def record_size(cls):
+        """Return the size of the binary records of the structure"""
+        return _codec(cls)[0].size
+
+    @classmethod
+    def from_bytes(cls, buffer, offset=0, *, validate=False):
+        """Build an instance from the binary record at offset in a buffer
+
+        The buffer, a memoryview for instance, is read in place. With validate, the
+        fields are checked by their descriptors like in from_rows().
+        """
+        packer, _, decode, validated_decode = _codec(cls)
+        decode = validated_decode if validate else decode
+        return decode(*packer.unpack_from(buffer, offset))
+
+    @classmethod
+    def iter_unpack(cls, buffer, *, validate=False):
+        """Lazily build instances from the consecutive binary records of a buffer"""
+        packer, _, decode, validated_decode = _codec(cls)
+        return starmap(validated_decode if validate else decode, packer.iter_unpack(buffer))
+
+
+
+# Typecodes of the array.array columns, by expected type of the descriptors. Number
+# fields are kept in lists, as no typecode holds both ints and floats unchanged
+_ARRAY_TYPECODES = {int: "q", float: "d"}
+
+
+def _compile(source_code, bindings, name):
+    """Execute generated source code and return the function it defines"""
+
+    exec(source_code, bindings)
+    return bindings[name]
+
+
+def _column_property(index, check, frozen=False):
+    """Make a property reading and validating a field of a row view, read-only for
+    frozen structures
+    """
+
+    def fget(row):
+        return row._array._columns[index][row._index]
+
+    def fset(row, value):
+        (value,) = check(value)
+        row._array._columns[index][row._index] = value
+
+    return property(fget) if frozen else property(fget, fset)
+
+
+def _array_layout(structure):
+    """Return the typecodes, row checks and row view class of a structure, made once"""
+
+    layout = structure.__dict__.get("_array_layout")
+    if layout is None:
+        descriptors = structure._fields
+        typecodes = [
+            _ARRAY_TYPECODES.get(getattr(descriptor, "expected_type", None))
+            for descriptor in descriptors.values()
+        ]
+        check = _compile(*_make_row_check(descriptors), "check")
+        coerce_check = _compile(*_make_row_check(descriptors, coerce=True), "check")
+        row_clsdict = {"__slots__": ()}
+        for index, (field, descriptor) in enumerate(descriptors.items()):
+            field_check = _compile(*_make_row_check({field: descriptor}), "check")
+            row_clsdict[field] = _column_property(
+                index, field_check, getattr(structure, "_frozen", False)
+            )
+        row_class = type(f"{structure.__name__}Row", (StructRow,), row_clsdict)
+        layout = typecodes, check, coerce_check, row_class
+        setattr(structure, "_array_layout", layout)
+    return layout
+
+
+def _storage(structure):
+    """Return whether the fields of a structure are slots, and its intern pool if any
+
+    Both are the ones of the class declaring the fields, which its subclasses inherit.
+    """
+
+    owner = next(cls for cls in structure.__mro__ if "_fields" in cls.__dict__)
+    return "__slots__" in owner.__dict__, owner.__dict__.get("_pool")
+
+
+def _row_parser(structure, coerce):
+    """Return the from_rows() parser of a structure, made once"""
+
+    parsers = structure.__dict__.get("_row_parsers")
+    if parsers is None:
+        parsers = {}
+        setattr(structure, "_row_parsers", parsers)
+    if coerce not in parsers:
+        slots, pool = _storage(structure)
+        source_code, bindings = _make_row_parser(
+            structure._fields, slots, coerce, pool is not None
+        )
+        bindings["_structure"] = structure
+        bindings["_pool"] = pool
+        parsers[coerce] = _compile(source_code, bindings, "parse")
+    return parsers[coerce]
+
+
+def _codec(structure):
+    """Return the struct, to_bytes method and decoders of a structure, made once"""
+
+    codec = structure.__dict__.get("_codec")
+    if codec is None:
+        fields = list(structure._fields)
+        formats = [
+            _struct_format(field, descriptor)
+            for field, descriptor in structure._fields.items()
+        ]
+        packer = Struct("<" + "".join(formats))
+        to_bytes = _compile(
+            _make_encoder(fields, formats), {"_pack": packer.pack}, "to_bytes"
+        )
+        slots, pool = _storage(structure)
+        decoders = []
+        for validate in (False, True):
+            source_code, bindings = _make_decoder(
+                fields, formats, slots, validate, pool is not None
+            )
+            bindings["_structure"] = structure
+            bindings["_pool"] = pool
+            if validate:
+                bindings["_parse"] = _row_parser(structure, False)
+            decoders.append(_compile(source_code, bindings, "decode"))
+        codec = packer, to_bytes, *decoders
+        setattr(structure, "_codec", codec)
+    return codec
+
+
+def _report_bad_row(structure, lineno, row, exc, on_error):
+    """Pass a row which failed to parse to on_error(lineno, row, exc), or log it"""
+
+    if on_error is None:
+        _log.warning("Skipping line %d of %s: %s", lineno, structure.__name__, exc)
+    else:
+        on_error(lineno, row, exc)
+
+
+def _parse_rows(structure, numbered_rows, coerce, on_error):
+    """Build instances from (line number, row) pairs, reporting and skipping bad rows"""
+
+    parse = _row_parser(structure, coerce)
+    for lineno, row in numbered_rows:
+        try:
+            instance = parse(*row)
+        except (TypeError, ValueError) as exc:
+            _report_bad_row(structure, lineno, row, exc, on_error)
+            continue
+        yield instance
+
+
+def _array_from_columns(structure, columns):
+    """Make a StructArray of a structure holding the given columns"""
+
+    struct_array = object.__new__(StructArray)
+    layout = _array_layout(structure)
+    _, struct_array._check, struct_array._coerce_check, struct_array._row_class = layout
+    struct_array.structure = structure
+    struct_array._columns = columns
+    struct_array._length = len(columns[0])
+    return struct_array
+
+
+class StructRow:
+    """A view on a row of a StructArray, with the fields of its structure"""
+
+    __slots__ = ("_array", "_index")
+
+    def __init__(self, array, index):
+        self._array = array
+        self._index = index
+
+    def __repr__(self):
+        args = ", ".join(repr(column[self._index]) for column in self._array._columns)
+        return f"{type(self).__name__}({args})"
+
+
+class StructArray:
+    """A container storing the instances of a structure column-wise
+
+    int and float fields are stored in array.array columns of 64-bit integers and
+    doubles, and other fields, Number ones included, in lists.
+    """
+
+    def __init__(self, structure, rows=()):
+        typecodes, self._check, self._coerce_check, self._row_class = _array_layout(
+            structure
+        )
+        self.structure = structure
+        self._columns = [array(code) if code else [] for code in typecodes]
+        self._length = 0
+        self.extend(rows)
+
+    @classmethod
+    def from_rows(cls, structure, rows, *, coerce=True, on_error=None):
+        """Make an array from rows of field values, converting them like
+        Structure.from_rows() and skipping and reporting the bad rows
+        """
+        struct_array = cls(structure)
+        check = struct_array._coerce_check if coerce else struct_array._check
+        for lineno, row in enumerate(rows, 1):
+            try:
+                struct_array._append(check(*row))
+            except (TypeError, ValueError, OverflowError) as exc:
+                _report_bad_row(structure, lineno, row, exc, on_error)
+        return struct_array
+
+    def append(self, row):
+        """Validate a row of field values and append it to the columns"""
+        self._append(self._check(*row))
+
+    def _append(self, values):
+        """Append validated field values to the columns"""
+        try:
+            for column, value in zip(self._columns, values):
+                column.append(value)
+        except (TypeError, OverflowError):
+            # Leave the columns at the same length if a value doesn't fit its array
+            for column in self._columns:
+                del column[self._length :]
+            raise
+        self._length += 1
+
+    def extend(self, rows):
+        """Validate and append rows of field values"""
+        for row in rows:
+            self.append(row)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            columns = [column[index] for column in self._columns]
+            return _array_from_columns(self.structure, columns)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("StructArray index out of range")
+        return self._row_class(self, index)
+
+    def __iter__(self):
+        row_class = self._row_class
+        for index in range(self._length):
+            yield row_class(self, index)
+
+    def __getattr__(self, name):
+        # Only called for missing attributes, which makes the fields read their column.
+        # The returned column is the underlying storage and must not be modified
+        structure = self.__dict__.get("structure")
+        try:
+            index = list(structure._fields).index(name)
+        except (AttributeError, ValueError):
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            ) from None
+        return self._columns[index]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} of {self._length} {self.structure.__name__}>"
+
+    def __reduce__(self):
+        # Pickled as its columns, the generated checks and row class being remade
+        return _array_from_columns, (self.structure, self._columns)
@@ -1,16 +1,15 @@
-from inspect import Parameter, Signature
-
-
-def make_signature(names):
-    """Make signatures for class attributes"""
-    return Signature(Parameter(name, Parameter.POSITIONAL_OR_KEYWORD) for name in names)
+try:
+    from .metaclass_structure import bind_init, make_signature, set_init
+except ImportError:  # Run as a script
+    from metaclass_structure import bind_init, make_signature, set_init
 
 
 def add_signature(*names):
-    """Add signatures to a class"""
+    """Add signatures to a class, with an __init__ made from them"""
 
     def decorate(cls):
         cls.__signature__ = make_signature(names)
+        set_init(cls, cls.__signature__)
         return cls
 
     return decorate
@@ -20,11 +19,7 @@ class Structure:
     """Structure base class for all classes"""
 
     __signature__ = make_signature([])
-
-    def __init__(self, *args, **kwargs):
-        bound_args = self.__signature__.bind(*args, **kwargs)
-        for name, val in bound_args.arguments.items():
-            setattr(self, name, val)
+    __init__ = bind_init
 
 
 @add_signature("ticker", "shares", "price")
@@ -37,5 +32,12 @@ class Point(Structure):
     """Class to represent a point"""
 
 
-a = Stock("F", price=18, shares=100)
-print(a.ticker, a.shares, a.price)
+def main():
+    """Main function"""
+
+    a = Stock("F", price=18, shares=100)
+    print(a.ticker, a.shares, a.price)
+
+
+if __name__ == "__main__":
+    main()
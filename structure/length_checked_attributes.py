@@ -1,8 +1,11 @@
 import re
-from time import time
 
-from metaclass_structure import make_signature
-from typed_checked_attributes import Descriptor, PositiveNumber, String
+try:
+    from .metaclass_structure import bind_init, make_signature, set_init
+    from .typed_checked_attributes import Descriptor, PositiveNumber, String
+except ImportError:  # Run as a script
+    from metaclass_structure import bind_init, make_signature, set_init
+    from typed_checked_attributes import Descriptor, PositiveNumber, String
 
 
 class Sized(Descriptor):
@@ -68,16 +71,14 @@ class StructMeta(type):
         clsobj = super().__new__(cls, name, bases, clsdict)
         sig = make_signature(fields)
         setattr(clsobj, "__signature__", sig)
+        set_init(clsobj, sig)
         return clsobj
 
 
 class Structure(metaclass=StructMeta):
     """Base class for all structures"""
 
-    def __init__(self, *args, **kwargs):
-        bound = self.__signature__.bind(*args, **kwargs)
-        for name, val in bound.arguments.items():
-            setattr(self, name, val)
+    __init__ = bind_init
 
 
 class Stock(Structure):
@@ -102,12 +103,12 @@ class Stock2:
         self.shares = shares
 
 
-stock = Stock("MSFT", "Microsoft", 300, 10)
-print(stock.ticker, stock.name, stock.price, stock.shares)
-start = time()
-for _ in range(1_000_000):
+def main():
+    """Main function"""
+
     stock = Stock("MSFT", "Microsoft", 300, 10)
-    # stock.price = 180
-    # stock.shares = 100
+    print(stock.ticker, stock.name, stock.price, stock.shares)
+
 
-print("Time taken:", time() - start)
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,120 @@
 from inspect import Parameter, Signature
 
 
+class _Optional:
+    """Default of the parameters of optional fields, left unset when omitted"""
+
+    def __repr__(self):
+        return "OPTIONAL"
+
+
+OPTIONAL = _Optional()
+
+# Default of the required parameters of generated __init__ methods
+_MISSING = object()
+
+
 def make_signature(names):
-    """Make signatures for class attributes"""
-    return Signature(Parameter(name, Parameter.POSITIONAL_OR_KEYWORD) for name in names)
+    """Make signatures for class attributes
+
+    names: the names of the attributes, or Parameter objects for attributes with
+    a default, optional or keyword-only
+    """
+    return Signature(
+        Parameter(name, Parameter.POSITIONAL_OR_KEYWORD) if isinstance(name, str) else name
+        for name in names
+    )
+
+
+def make_init(sig):
+    """Make an __init__ method setting the attributes of the parameters of a signature
+
+    Python binds the arguments itself, and the errors of Signature.bind are raised for
+    missing and extra ones. Omitted parameters take their default, except OPTIONAL
+    ones which leave their attribute unset. Returns None for signatures with *args or
+    **kwargs, left to Signature.bind.
+    """
+    params = list(sig.parameters.values())
+    if any(p.kind in (Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD) for p in params):
+        return None
+    bindings = {"_MISSING": _MISSING, "_OPTIONAL": OPTIONAL}
+    args = ["self"]
+    for i, param in enumerate(params):
+        if param.kind is Parameter.KEYWORD_ONLY and "*_args" not in args:
+            args.append("*_args")
+        if param.default is Parameter.empty:
+            default = "_MISSING"
+        elif param.default is OPTIONAL:
+            default = "_OPTIONAL"
+        else:
+            default = f"_default{i}"
+            bindings[default] = param.default
+        args.append(f"{param.name}={default}")
+        if param.kind is Parameter.POSITIONAL_ONLY and (
+            i + 1 == len(params) or params[i + 1].kind is not Parameter.POSITIONAL_ONLY
+        ):
+            args.append("/")
+    if "*_args" not in args:
+        args.append("*_args")
+    args.append("**_kwargs")
+
+    required = [p.name for p in params if p.default is Parameter.empty]
+    lines = [f"def __init__({', '.join(args)}):"]
+    lines.append(
+        f"    if {' or '.join(['_args', '_kwargs', *(f'{n} is _MISSING' for n in required)])}:"
+    )
+    lines.append("        if _args:")
+    lines.append("            raise TypeError('too many positional arguments')")
+    for param in params:
+        if param.default is not Parameter.empty:
+            continue
+        name = param.name
+        if param.kind is Parameter.POSITIONAL_ONLY:
+            lines.append(f"        if {name} is _MISSING and {name!r} in _kwargs:")
+            lines.append(
+                f"            raise TypeError(\"{name!r} parameter is positional only, but was passed as a keyword\")"
+            )
+        lines.append(f"        if {name} is _MISSING:")
+        lines.append(f"            raise TypeError(\"missing a required argument: {name!r}\")")
+    lines.append(
+        "        raise TypeError(f'got an unexpected keyword argument {next(iter(_kwargs))!r}')"
+    )
+    for param in params:
+        if param.default is OPTIONAL:
+            lines.append(f"    if {param.name} is not _OPTIONAL:")
+            lines.append(f"        self.{param.name} = {param.name}")
+        else:
+            lines.append(f"    self.{param.name} = {param.name}")
+    namespace = {}
+    exec("\n".join(lines) + "\n", bindings, namespace)
+    return namespace["__init__"]
+
+
+def bind_init(self, *args, **kwargs):
+    """Set the attributes of the arguments bound to the signature of the class"""
+    bound_args = self.__signature__.bind(*args, **kwargs)
+    for name, val in bound_args.arguments.items():
+        setattr(self, name, val)
+
+
+bind_init._from_signature = True
+
+
+def set_init(cls, sig):
+    """Give a class the __init__ made from a signature
+
+    Classes defining their __init__ or inheriting one not made from a signature keep it.
+    """
+    if "__init__" in cls.__dict__ or not getattr(cls.__init__, "_from_signature", False):
+        return
+    init = make_init(sig)
+    if init is None:
+        cls.__init__ = bind_init
+        return
+    init.__qualname__ = f"{cls.__qualname__}.__init__"
+    init.__module__ = cls.__module__
+    init._from_signature = True
+    cls.__init__ = init
 
 
 class StructMeta(type):
@@ -13,6 +124,7 @@ class StructMeta(type):
         clsobj = super().__new__(cls, clsname, bases, clsdict)
         sig = make_signature(clsobj._fields)
         setattr(clsobj, "__signature__", sig)
+        set_init(clsobj, sig)
         return clsobj
 
 
@@ -20,14 +132,14 @@ class Structure(metaclass=StructMeta):
     """Structure base class with metaclass for all classes"""
 
     _fields = []
-
-    def __init__(self, *args, **kwargs):
-        bound_args = self.__signature__.bind(*args, **kwargs)
-        for name, val in bound_args.arguments.items():
-            setattr(self, name, val)
+    __init__ = bind_init
 
     def __repr__(self):
-        args = ", ".join(repr(getattr(self, name)) for name in self._fields)
+        args = ", ".join(
+            repr(getattr(self, name))
+            for name in self.__signature__.parameters
+            if hasattr(self, name)
+        )
         return f"{type(self).__name__}({args})"
 
 
@@ -0,0 +1,203 @@
+from decimal import Decimal
+import pickle
+from fractions import Fraction
+
+import pytest
+
+from .code_generation import (
+    Float,
+    Holding,
+    Integer,
+    Quote,
+    SizedString,
+    Stock,
+    String,
+    Structure,
+    Venue,
+)
+
+
+class MyVenue(Venue):
+    """A subclass of an interned structure adding only methods"""
+
+    def label(self):
+        return f"{self.mic} {self.name}"
+
+
+def test_intern_identity_per_class():
+    venue = Venue("XNAS", "Nasdaq")
+    my_venue = MyVenue("XNAS", "Nasdaq")
+    assert type(venue) is Venue and type(my_venue) is MyVenue
+    assert Venue("XNAS", "Nasdaq") is venue
+    assert MyVenue("XNAS", "Nasdaq") is my_venue
+
+
+class Point(Structure, slots=True):
+    """A slotted structure"""
+
+    x = Integer()
+    label = String()
+
+
+class MyPoint(Point):
+    """A subclass of a slotted structure adding only methods"""
+
+
+def test_from_rows_slotted_subclass():
+    (point,) = MyPoint.from_rows([("1", "a")])
+    assert type(point) is MyPoint
+    assert (point.x, point.label) == (1, "a")
+
+
+def test_from_rows_interned_subclass():
+    venue = MyVenue("XNAS", "Nasdaq")
+    (parsed,) = MyVenue.from_rows([("XNAS", "Nasdaq")])
+    assert parsed is venue
+    (parsed,) = Venue.from_rows([("XNAS", "Nasdaq")])
+    assert type(parsed) is Venue
+
+
+class Record(Structure, slots=True):
+    """A slotted structure with fixed-width binary records"""
+
+    code = SizedString(maxlen=8)
+    count = Integer()
+    price = Float()
+
+
+class MyRecord(Record):
+    """A subclass of a slotted structure with binary records"""
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_codec_round_trip(validate):
+    holding = Holding("AAPL", 2**60 + 1, 0.1)
+    decoded = Holding.from_bytes(holding.to_bytes(), validate=validate)
+    assert (decoded.ticker, decoded.shares, decoded.price) == ("AAPL", 2**60 + 1, 0.1)
+    assert (type(decoded.shares), type(decoded.price)) == (int, float)
+
+
+def test_codec_rejects_number_fields():
+    with pytest.raises(TypeError):
+        Stock("MSFT", "Microsoft", 300, 10).to_bytes()
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_from_bytes_slotted_subclass(validate):
+    buffer = MyRecord("ab", 3, 1.5).to_bytes() + MyRecord("cd", 4, 2.5).to_bytes()
+    records = list(MyRecord.iter_unpack(buffer, validate=validate))
+    assert [type(record) for record in records] == [MyRecord, MyRecord]
+    assert [(r.code, r.count, r.price) for r in records] == [("ab", 3, 1.5), ("cd", 4, 2.5)]
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_from_bytes_interned_subclass(validate):
+    venue = MyVenue("XNAS", "Nasdaq")
+    assert MyVenue.from_bytes(venue.to_bytes(), validate=validate) is venue
+    assert type(Venue.from_bytes(venue.to_bytes(), validate=validate)) is Venue
+
+
+class Reading(Structure, fused=True):
+    """A structure with a field named like the value checked by set_code()"""
+
+    count = Integer()
+    value = Float()
+
+
+class SlottedReading(Structure, slots=True):
+    """A slotted structure with a field named value"""
+
+    count = Integer()
+    value = Float()
+
+
+@pytest.mark.parametrize("structure", [Reading, SlottedReading])
+def test_field_named_value(structure):
+    reading = structure(3, 1.5)
+    assert (reading.count, reading.value) == (3, 1.5)
+    (parsed,) = structure.from_rows([("3", "1.5")])
+    assert (parsed.count, parsed.value) == (3, 1.5)
+    with pytest.raises(TypeError):
+        structure(3, 1)
+
+
+def test_array_keeps_number_values():
+    stocks = Stock.array([("MSFT", "Microsoft", 300, 2**60 + 1)])
+    stocks.append(("AAPL", "Apple", Decimal("0.1"), Fraction(1, 3)))
+    msft, aapl = stocks
+    assert (msft.shares, msft.price) == (300, 2**60 + 1)
+    assert type(msft.shares) is int
+    assert (aapl.shares, aapl.price) == (Decimal("0.1"), Fraction(1, 3))
+    assert (type(aapl.shares), type(aapl.price)) == (Decimal, Fraction)
+
+
+class MyQuote(Quote):
+    """A subclass of a frozen structure adding only methods"""
+
+    def label(self):
+        return f"{self.ticker} {self.price}"
+
+
+@pytest.mark.parametrize("structure", [Quote, MyQuote])
+def test_frozen_refuses_changes(structure):
+    quote = structure("MSFT", 300)
+    with pytest.raises(AttributeError):
+        quote.price = 400
+    with pytest.raises(AttributeError):
+        del quote.ticker
+    assert (quote.ticker, quote.price) == ("MSFT", 300)
+
+
+@pytest.mark.parametrize("structure", [Quote, MyQuote])
+def test_frozen_eq_hash_pickle(structure):
+    quote = structure("MSFT", 300)
+    assert quote == structure("MSFT", 300) and quote != structure("MSFT", 301)
+    assert hash(quote) == hash(structure("MSFT", 300))
+    assert len({quote, structure("MSFT", 300), structure("AAPL", 200)}) == 2
+    copy = pickle.loads(pickle.dumps(quote))
+    assert type(copy) is structure and copy == quote
+    assert Quote("MSFT", 300) != MyQuote("MSFT", 300)
+
+
+@pytest.mark.parametrize("structure", [Quote, MyQuote])
+def test_from_rows_frozen(structure):
+    (quote,) = structure.from_rows([("MSFT", "300")])
+    assert type(quote) is structure and quote == structure("MSFT", 300)
+    with pytest.raises(AttributeError):
+        quote.price = 400
+
+
+def test_interned_pickle():
+    venue = MyVenue("XNAS", "Nasdaq")
+    assert pickle.loads(pickle.dumps(venue)) is venue
+
+
+@pytest.mark.parametrize("structure", [Quote, MyQuote])
+def test_array_rows_frozen(structure):
+    (quote,) = structure.array([("MSFT", 300)])
+    assert (quote.ticker, quote.price) == ("MSFT", 300)
+    with pytest.raises(AttributeError):
+        quote.price = 400
+
+
+class Tick(Structure, slots=True, frozen=True):
+    """A slotted frozen structure with fixed-width binary records"""
+
+    code = SizedString(maxlen=8)
+    count = Integer()
+
+
+class MyTick(Tick):
+    """A subclass of a slotted frozen structure adding only methods"""
+
+
+@pytest.mark.parametrize("structure", [Tick, MyTick])
+@pytest.mark.parametrize("validate", [False, True])
+def test_from_rows_from_bytes_slotted_frozen(structure, validate):
+    tick = structure("ab", 3)
+    (parsed,) = structure.from_rows([("ab", "3")])
+    decoded = structure.from_bytes(tick.to_bytes(), validate=validate)
+    for copy in (parsed, decoded):
+        assert type(copy) is structure and copy == tick and hash(copy) == hash(tick)
+        with pytest.raises(AttributeError):
+            copy.count = 4
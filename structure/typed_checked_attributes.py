@@ -1,6 +1,9 @@
 from numbers import Number
 
-from metaclass_structure import Structure
+try:
+    from .metaclass_structure import Structure
+except ImportError:  # Run as a script
+    from metaclass_structure import Structure
 
 
 class Descriptor: